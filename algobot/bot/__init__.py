@@ -3,15 +3,34 @@ from aiogram.utils.chat_action import ChatActionMiddleware
 
 from tgutils.middleware.logging import LoggingMiddleware
 
+from algobot.config import sheets_config, telegram_config
+from algobot.data.connectors.async_tables import AsyncTable
 from .handlers import router
 from .middleware.enabler import EnablerMiddleware
+from .middleware.limiter import ConcurrencyLimitMiddleware
+from .middleware.metrics import MetricsMiddleware
 from .middleware.tg_updater import TelegramUpdaterMiddleware
+from .storage import create_storage
 
-dispatcher = Dispatcher()
+dispatcher = Dispatcher(storage=create_storage(telegram_config.get('fsm', {})))
+update_limiter = ConcurrencyLimitMiddleware(
+    telegram_config.get('max_concurrent_updates', 64)
+)
+tg_updater = TelegramUpdaterMiddleware(
+    telegram_config.get('profiles_flush_interval', 5)
+)
 
 dispatcher.include_router(router)
+dispatcher.message.middleware.register(MetricsMiddleware())
+dispatcher.callback_query.middleware.register(MetricsMiddleware())
 dispatcher.message.middleware.register(EnablerMiddleware())
 dispatcher.message.middleware.register(ChatActionMiddleware())
 
+dispatcher.update.outer_middleware.register(update_limiter)
 dispatcher.update.outer_middleware.register(LoggingMiddleware())
-dispatcher.update.outer_middleware.register(TelegramUpdaterMiddleware())
+dispatcher.update.outer_middleware.register(tg_updater)
+
+if sheets_config.get('warm_up', False):
+    dispatcher.startup.register(AsyncTable.warm_up)
+dispatcher.shutdown.register(AsyncTable.flush_writes)
+dispatcher.shutdown.register(tg_updater.close)
@@ -3,12 +3,11 @@ from enum import Enum
 from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from aiogram.types import Message, InlineKeyboardMarkup, CallbackQuery
+from aiogram.types import Message, InlineKeyboardMarkup, CallbackQuery, ReplyParameters
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from .feature import EnablerRouter
-from algobot.data.connectors.students import Students
-from algobot.data.connectors.users import Users
+from algobot.data.connectors.async_db import AsyncStudents, AsyncUsers
 from algobot.data.helpers.formatters import user_reference, full_student_info
 
 
@@ -43,7 +42,7 @@ async def register_command_handler(message: Message, state: FSMContext):
     tg_username = message.from_user.username
     tg_name = message.from_user.full_name
 
-    if user := Users.get_user(tg_id):
+    if user := await AsyncUsers.get_user(tg_id):
         full_student_name = full_student_info(user['student_name'], user['group_id'])
         await message.reply(
             f'You are already registered as `{full_student_name}`.\n'
@@ -55,7 +54,9 @@ async def register_command_handler(message: Message, state: FSMContext):
     tg_ref = user_reference(tg_id, tg_username, tg_name)
     await state.update_data(
         {
-            'message': message,
+            # only ids are kept, the conversation outlives the message object across restarts
+            'chat_id': message.chat.id,
+            'message_id': message.message_id,
             'tg_id': tg_id,
             'tg_username': tg_username,
             'tg_name': tg_name,
@@ -63,33 +64,35 @@ async def register_command_handler(message: Message, state: FSMContext):
         }
     )
     await state.set_state(RegisterState.Group)
-    groups = Students.list_groups()
+    groups = await AsyncStudents.list_groups()
     await message.reply('Select your group', reply_markup=group_selector(groups))
 
 
 @register_router.entry_point(command='forget')
 async def forget_command_handler(message: Message, state: FSMContext):
     tg_id = message.from_user.id
-    if not Users.get_user(tg_id):
+    if not await AsyncUsers.get_user(tg_id):
         await message.reply(
             f'You are not registered yet... Use /{CommandName.REGISTER.value} to introduce yourself.'
         )
         return
 
     await state.clear()
-    Users.delete_user(tg_id)
+    await AsyncUsers.delete_user(tg_id)
     await message.reply('Your registration is revoked')
 
 
 @register_router.callback_query(RegisterState.Group, GroupCallback.filter())
 async def select_group_handler(query: CallbackQuery, state: FSMContext):
-    original_message: Message = (await state.get_data())['message']
+    data = await state.get_data()
     group_id = GroupCallback.unpack(query.data).group_id
     await state.update_data({'group_id': group_id})
     await query.answer(f'Selected group {group_id}')
     await state.set_state(RegisterState.Name)
-    await original_message.reply(
-        'Please write your name (exactly as in corresponding table)'
+    await query.bot.send_message(
+        data['chat_id'],
+        'Please write your name (exactly as in corresponding table)',
+        reply_parameters=ReplyParameters(message_id=data['message_id']),
     )
 
 
@@ -100,14 +103,14 @@ async def input_name_handler(message: Message, state: FSMContext):
     group_id = data['group_id']
     student_name = message.text
 
-    if not Students.get_student_by_name(group_id, student_name):
+    if not await AsyncStudents.get_student_by_name(group_id, student_name):
         await message.reply(
             f'There is no such student in group `{group_id}`.\n'
             f'Choose another one or contact the administrator.',
             parse_mode='Markdown',
         )
         return
-    if user := Users.get_user_by_name(group_id, student_name):
+    if user := await AsyncUsers.get_user_by_name(group_id, student_name):
         full_student_name = full_student_info(user['student_name'], user['group_id'])
         holder_reference = user_reference(
             user['tg_id'], user['tg_username'], user['tg_name']
@@ -120,5 +123,5 @@ async def input_name_handler(message: Message, state: FSMContext):
         return
 
     await state.clear()
-    Users.insert_user(tg_id, tg_username, tg_name, group_id, student_name)
+    await AsyncUsers.insert_user(tg_id, tg_username, tg_name, group_id, student_name)
     await message.reply(f'Ok, registered as `{student_name}`', parse_mode='Markdown')
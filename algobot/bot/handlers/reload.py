@@ -1,18 +1,55 @@
+import asyncio
+
 from aiogram import Router
-from aiogram.filters.command import Command
+from aiogram.filters.command import Command, CommandObject
 from aiogram.types import Message
 
 from ..filters.access import IsAdmin
+from ...config import reload_config
+from ...data.connectors.async_tables import AsyncTable
 from ...data.connectors.tables import Table
 from ...data.helpers.defaults import get_default_course
 
 reload_router = Router()
+REPORT_LIMIT = 3500
 
 
 @reload_router.message(IsAdmin, Command('reload'))
-async def toggle_command_handler(message: Message):
-    group = message.text.removeprefix('/reload ')
+async def toggle_command_handler(message: Message, command: CommandObject):
+    if command.args is None:
+        # config and templates are read again, tables built from outdated ones are dropped
+        reload_config()
+        evicted = await AsyncTable.evict_changed()
+        tables = ', '.join(f'{table.course} {table.group_ids}' for table in evicted)
+        await message.reply(
+            f'Config reloaded, evicted {len(evicted)} tables {tables}'.strip()
+        )
+        return
+
+    group = command.args.strip()
     course = get_default_course(group)
-    table = Table.get_table(course, group_id=group)
-    table.reload(update_db=False)
+    try:
+        await AsyncTable.rebuild(course, group_id=group)
+    except Exception as e:
+        await message.reply(f'Failed to reload {group}: {e!r}')
+        return
     await message.reply('Ok')
+
+
+def _kilobytes(size: int) -> str:
+    return f'{size / 1024:.0f}K'
+
+
+@reload_router.message(IsAdmin, Command('tables'))
+async def tables_command_handler(message: Message):
+    # sizes are measured by walking the tables, which is kept off the event loop
+    report = await asyncio.to_thread(Table.registry_report)
+    lines = [f'{len(report)} tables, most recently used first']
+    for table, idle, usage in report:
+        parts = ' '.join(f'{part}={_kilobytes(size)}' for part, size in usage.items())
+        lines.append(
+            f'{table.course} {",".join(table.group_ids)}: '
+            f'{_kilobytes(sum(usage.values()))} ({parts}), idle {idle:.0f}s'
+        )
+    text = '\n'.join(lines)
+    await message.reply(f'```\n{text[:REPORT_LIMIT]}```', parse_mode='Markdown')
@@ -0,0 +1,11 @@
+from aiogram.types import ErrorEvent
+
+QUOTA_MESSAGE = 'Google Sheets is overloaded right now, please try again in a minute'
+
+
+async def quota_error_handler(event: ErrorEvent):
+    update = event.update
+    if update.callback_query is not None:
+        await update.callback_query.answer(QUOTA_MESSAGE, show_alert=True)
+    elif update.message is not None:
+        await update.message.reply(QUOTA_MESSAGE)
@@ -0,0 +1,88 @@
+import asyncio
+from dataclasses import dataclass
+
+from aiogram.types import BufferedInputFile, Message
+
+from ..feature import EnablerRouter
+from algobot.bot.filters.access import IsAdmin
+from algobot.utils.profiler import (
+    CallProfiler,
+    ProfileReport,
+    StackSampler,
+    create_profiler,
+)
+
+profile_router = EnablerRouter('profile', enabled_by_default=False)
+DEFAULT_WINDOW = 30
+MAX_WINDOW = 600
+SUMMARY_LIMIT = 3500
+USAGE = 'Usage: /profile [seconds] [stacks|calls], /profile stop'
+
+
+@dataclass
+class ProfilingSession:
+    profiler: CallProfiler | StackSampler
+    mode: str
+    stopper: asyncio.Task | None = None
+
+
+session: ProfilingSession | None = None
+
+
+def stop_session() -> ProfileReport:
+    global session
+    current, session = session, None
+    if current.stopper is not None and current.stopper is not asyncio.current_task():
+        current.stopper.cancel()
+    return current.profiler.stop()
+
+
+async def send_report(message: Message, report: ProfileReport):
+    if not report.dump:
+        return await message.answer(
+            'Nothing was recorded, the window was too short or idle'
+        )
+    await message.answer(
+        f'```\n{report.summary[:SUMMARY_LIMIT]}```', parse_mode='Markdown'
+    )
+    await message.answer_document(
+        BufferedInputFile(report.dump, filename=report.filename)
+    )
+
+
+async def stop_later(message: Message, seconds: int):
+    await asyncio.sleep(seconds)
+    await send_report(message, stop_session())
+
+
+@profile_router.entry_point(IsAdmin)
+async def profile_handler(message: Message):
+    global session
+    args = message.text.split()[1:]
+    if args[:1] == ['stop']:
+        if session is None:
+            return await message.reply('Profiling is not running')
+        return await send_report(message, stop_session())
+    if session is not None:
+        return await message.reply(
+            f'Profiling of {session.mode} is already running, use /profile stop'
+        )
+
+    try:
+        seconds = min(int(args[0]), MAX_WINDOW) if args else DEFAULT_WINDOW
+        mode = args[1] if len(args) > 1 else 'stacks'
+        profiler = create_profiler(mode)
+    except ValueError as e:
+        return await message.reply(f'{e}\n{USAGE}')
+
+    session = ProfilingSession(profiler, mode)
+    started = False
+    try:
+        profiler.start()
+        session.stopper = asyncio.create_task(stop_later(message, seconds))
+        started = True
+    finally:
+        # a profiler that failed to start must not block the next /profile
+        if not started:
+            session = None
+    await message.reply(f'Profiling {mode} for {seconds}s')
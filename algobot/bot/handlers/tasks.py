@@ -6,8 +6,9 @@ from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
-from algobot.data.connectors.tables import ChangeMarkingVerdict, Table, MarkStatus
-from algobot.data.connectors.users import Users
+from algobot.data.connectors.async_db import AsyncUsers
+from algobot.data.connectors.async_tables import AsyncTable
+from algobot.data.connectors.tables import ChangeMarkingVerdict, MarkStatus
 from algobot.data.helpers.defaults import get_default_course
 from tgutils.consts.aliases import KeyboardBuilder, Button
 from tgutils.consts.buttons import FAIL_MINI, OK_MINI, RECORD
@@ -44,7 +45,10 @@ class TaskPaginator(VerticalPaginator[str]):
     def make_button(self, item: str) -> Button:
         marked = item in self.marked
         text = (OK_MINI if marked else FAIL_MINI) + item
-        return Button(text=text, callback_data=TaskPaginator.TaskCallback(task=item, mark=not marked).pack())
+        return Button(
+            text=text,
+            callback_data=TaskPaginator.TaskCallback(task=item, mark=not marked).pack(),
+        )
 
 
 @dataclass
@@ -54,8 +58,15 @@ class TasksContext(Context):
 
     group_id: str = None
     student_name: str = None
-    table: Table = None
+    # the table itself is looked up in the registry on use, contexts are persisted
+    course: str = None
+    week_list: list[str] = field(default_factory=list)
     selected_week: str = None
+    # statuses are kept as their values, the context is stored as json
+    week_tasks: list[tuple[str, str]] = field(default_factory=list)
+
+    async def get_table(self) -> AsyncTable:
+        return await AsyncTable.get_table(self.course, group_id=self.group_id)
 
 
 TasksContext.prepare(tasks_router)
@@ -86,34 +97,40 @@ async def handle_command(context: TasksContext, message: Message):
     context.set_default(context.senders.EDIT)
 
     tg_id = message.from_user.id
-    if user := Users.get_user(tg_id):
+    if user := await AsyncUsers.get_user(tg_id):
         context.group_id, context.student_name = user['group_id'], user['student_name']
-        context.table = Table.get_table(get_default_course(context.group_id), group_id=context.group_id)
+        context.course = get_default_course(context.group_id)
+        context.week_list = (await context.get_table()).list_weeks()
         await context.advance(TasksState.WEEK, sender=message.reply, cause=message)
         return
 
-    await message.reply(f'Please, first use /{RegisterCommandNames.REGISTER.value} to introduce yourself')
+    await message.reply(
+        f'Please, first use /{RegisterCommandNames.REGISTER.value} to introduce yourself'
+    )
     await context.finish()
 
 
 @TasksContext.register(TasksState.WEEK)
 def week_menu(context: TasksContext) -> Response:
     if context.last_transition != ContextTransition.HOLD:
-        context.weeks.items = context.table.list_weeks()
+        context.weeks.items = list(context.week_list)
 
     keyboard = KeyboardBuilder()
     context.weeks.to_builder(keyboard)
     keyboard.row(context.menu_button(context.Action.FINISH))
-    return Response(
-        text='Choose a week',
-        markup=keyboard.as_markup()
-    )
+    return Response(text='Choose a week', markup=keyboard.as_markup())
 
 
 @tasks_router.callback_query(TasksState.WEEK, WeekPaginator.WeekCallback.filter())
 @TasksContext.inject
 async def handle_week_select(context: TasksContext, query: CallbackQuery):
     context.selected_week = WeekPaginator.WeekCallback.unpack(query.data).week
+    # menus are rendered synchronously, so sheet data is fetched beforehand
+    table = await context.get_table()
+    week_tasks = await table.list_week_tasks(
+        context.group_id, context.student_name, context.selected_week
+    )
+    context.week_tasks = [(task, status.value) for task, status in week_tasks]
     await context.advance(TasksState.TASKS)
 
 
@@ -124,30 +141,21 @@ class CommitCallback(CallbackData, prefix='tasks-commit'):
 @TasksContext.register(TasksState.TASKS)
 def task_menu(context: TasksContext) -> Response:
     if context.last_transition != ContextTransition.HOLD:
-        tasks = context.table.list_week_tasks(
-            context.group_id,
-            context.student_name,
-            context.selected_week
-        )
         context.tasks.items = []
         context.tasks.marked = set()
-        for task, status in tasks:
+        for task, status in context.week_tasks:
             context.tasks.items.append(task)
-            if status in (MarkStatus.MARKED, MarkStatus.MARKED_LOCKED):
+            if MarkStatus(status) in (MarkStatus.MARKED, MarkStatus.MARKED_LOCKED):
                 context.tasks.marked.add(task)
 
     keyboard = KeyboardBuilder()
     context.tasks.to_builder(keyboard)
     keyboard.row(
         context.menu_button(context.Action.BACK),
-        Button(
-            text=f'{RECORD} Commit',
-            callback_data=CommitCallback().pack()
-        ),
+        Button(text=f'{RECORD} Commit', callback_data=CommitCallback().pack()),
     )
     return Response(
-        text='Change marking of tasks and press Commit',
-        markup=keyboard.as_markup()
+        text='Change marking of tasks and press Commit', markup=keyboard.as_markup()
     )
 
 
@@ -170,7 +178,8 @@ async def handle_commit(context: TasksContext, query: CallbackQuery, bot: Bot):
         (context.selected_week, task, task in context.tasks.marked)
         for task in context.tasks.items
     ]
-    result = context.table.update_tasks(context.group_id, context.student_name, task_list)
+    table = await context.get_table()
+    result = await table.update_tasks(context.group_id, context.student_name, task_list)
 
     await query.answer('Done!')
     if len(result[ChangeMarkingVerdict.UNAVAILABLE]) > 0:
@@ -181,7 +190,7 @@ async def handle_commit(context: TasksContext, query: CallbackQuery, bot: Bot):
         tasks_string = ', '.join(sorted(skipped))
         await bot.send_message(
             context.chat_id,
-            f'Tasks {tasks_string} are locked, send this message to your teacher to update manually'
+            f'Tasks {tasks_string} are locked, send this message to your teacher to update manually',
         )
 
     await context.finish()
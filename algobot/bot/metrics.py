@@ -0,0 +1,103 @@
+from collections import Counter
+from dataclasses import asdict
+
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiohttp import web
+
+from algobot.data.connectors.tables import Table
+from algobot.drivers.google import sheets_scheduler
+from algobot.utils.metrics import CallbackMetric, render
+from . import dispatcher, update_limiter
+from .storage import SqliteStorage
+
+
+def _cache_events() -> dict[tuple[str, ...], float]:
+    with Table._caches_lock:
+        caches = list(Table._caches.items())
+    return {
+        (worksheet, event): count
+        for (_, worksheet), cache in caches
+        for event, count in asdict(cache.statistics).items()
+    }
+
+
+def _fsm_sessions() -> dict[tuple[str, ...], float]:
+    storage = dispatcher.storage
+    if isinstance(storage, SqliteStorage):
+        states = storage.active_states()
+    elif isinstance(storage, MemoryStorage):
+        states = Counter(
+            record.state for record in storage.storage.values() if record.state
+        )
+    else:
+        return {}
+    return {(state,): count for state, count in states.items()}
+
+
+def _scheduler_statistics() -> dict[tuple[str, ...], float]:
+    if sheets_scheduler is None:
+        return {}
+    return {
+        (name,): value for name, value in asdict(sheets_scheduler.statistics).items()
+    }
+
+
+def _scheduler_waiting() -> dict[tuple[str, ...], float]:
+    if sheets_scheduler is None:
+        return {}
+    return {(kind,): count for kind, count in sheets_scheduler.waiting.items()}
+
+
+CallbackMetric(
+    'algobot_sheets_cache_events_total',
+    'Worksheet snapshot cache lookups and loads by outcome',
+    'counter',
+    _cache_events,
+    ('worksheet', 'event'),
+)
+CallbackMetric(
+    'algobot_sheets_quota_total',
+    'Quota scheduler calls, retries and accumulated wait seconds',
+    'counter',
+    _scheduler_statistics,
+    ('statistic',),
+)
+CallbackMetric(
+    'algobot_sheets_quota_waiting',
+    'Sheets calls waiting for quota tokens',
+    'gauge',
+    _scheduler_waiting,
+    ('kind',),
+)
+CallbackMetric(
+    'algobot_fsm_sessions',
+    'Chats with an active conversation state',
+    'gauge',
+    _fsm_sessions,
+    ('state',),
+)
+CallbackMetric(
+    'algobot_tables_loaded',
+    'Tables held by the registry',
+    'gauge',
+    lambda: {(): len(Table._instances)},
+)
+CallbackMetric(
+    'algobot_updates_in_flight',
+    'Updates being processed right now',
+    'gauge',
+    lambda: {(): update_limiter.in_flight},
+)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type='text/plain', charset='utf-8')
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,39 @@
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from algobot.utils.metrics import Histogram
+
+handler_seconds = Histogram(
+    'algobot_handler_seconds',
+    'Update handling time by feature router and handler',
+    ('router', 'handler', 'outcome'),
+)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ):
+        router = data.get('event_router')
+        handler_object = data.get('handler')
+        labels = {
+            'router': getattr(router, 'feature_name', None)
+            or getattr(router, 'name', ''),
+            'handler': handler_object.callback.__name__ if handler_object else '',
+        }
+        started, outcome = time.perf_counter(), 'ok'
+        try:
+            return await handler(event, data)
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            handler_seconds.observe(
+                time.perf_counter() - started, outcome=outcome, **labels
+            )
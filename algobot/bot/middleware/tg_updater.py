@@ -1,22 +1,69 @@
+import asyncio
+import logging
 from typing import Any, Awaitable, Callable
 
 from aiogram import BaseMiddleware
-from aiogram.types import Update
+from aiogram.types import Update, User
+from cachetools import LRUCache
 
-from algobot.data.connectors.users import Users
+from algobot.data.connectors.async_db import AsyncUsers
 from algobot.data.helpers.formatters import full_name
 
 
 class TelegramUpdaterMiddleware(BaseMiddleware):
+    def __init__(self, flush_interval: float = 5, max_profiles: int = 10000):
+        self.flush_interval = flush_interval
+        # last seen profile per user, updates only go to the database when it changes
+        self.profiles: LRUCache[int, tuple[str | None, str]] = LRUCache(
+            maxsize=max_profiles
+        )
+        self.pending: dict[int, tuple[str | None, str]] = {}
+        self._flusher: asyncio.Task | None = None
+
     async def __call__(
         self,
         handler: Callable[[Update, dict[str, Any]], Awaitable[Any]],
         event: Update,
         data: dict[str, Any],
     ):
-        full_data = event.model_dump()[event.event_type]
-        user = full_data['from_user']
-        tg_id, tg_username = user['id'], user['username']
-        tg_name = full_name(user['first_name'], user['last_name'])
-        Users.update_tg_data(tg_id, tg_username, tg_name)
+        user: User | None = data.get('event_from_user')
+        if user is not None:
+            self._remember(user)
         return await handler(event, data)
+
+    def _remember(self, user: User):
+        profile = (user.username, full_name(user.first_name, user.last_name))
+        if self.profiles.get(user.id) == profile:
+            return
+        self.profiles[user.id] = profile
+        self.pending[user.id] = profile
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+    async def flush(self):
+        if len(self.pending) == 0:
+            return
+        pending, self.pending = self.pending, {}
+        try:
+            await AsyncUsers.update_tg_data_many(
+                [
+                    (tg_id, tg_username, tg_name)
+                    for tg_id, (tg_username, tg_name) in pending.items()
+                ]
+            )
+        except Exception as e:
+            logging.error(f'Failed to update {len(pending)} telegram profiles: {e!r}')
+            # forgotten profiles are queued again on the next update from their users
+            for tg_id in pending:
+                self.profiles.pop(tg_id, None)
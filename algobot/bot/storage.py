@@ -0,0 +1,255 @@
+import asyncio
+import importlib
+import json
+import logging
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+from aiogram.fsm.storage.memory import MemoryStorage
+from pydantic import BaseModel
+
+from algobot.data.connectors.async_db import AsyncSessions
+
+
+@dataclass
+class _Record:
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+    encoded: bytes = b'{}'
+    updated_at: float = field(default_factory=time.time)
+
+
+# menu contexts keep their own objects in data, only classes of these packages are
+# stored by their fields and restored, nothing else is imported or called on load
+_SESSION_PACKAGES = ('algobot', 'tgutils', 'aiogram')
+
+
+def _is_session_type(cls: type) -> bool:
+    return cls.__module__.split('.')[0] in _SESSION_PACKAGES
+
+
+def _resolve_type(name: str, base: type = object) -> type:
+    module, _, qualname = name.partition(':')
+    if module.split('.')[0] not in _SESSION_PACKAGES:
+        raise ValueError(f'Type {name} can not be restored from a session')
+    try:
+        cls = importlib.import_module(module)
+        for part in qualname.split('.'):
+            cls = getattr(cls, part)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f'Type {name} is not available: {e!r}')
+    if not isinstance(cls, type) or not issubclass(cls, base):
+        raise ValueError(f'{name} is not a {base.__name__} type')
+    return cls
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (set, frozenset)):
+        return {'__set__': list(value)}
+    cls = type(value)
+    if not _is_session_type(cls):
+        raise TypeError(f'Object of type {cls.__name__} is not JSON serializable')
+    name = f'{cls.__module__}:{cls.__qualname__}'
+    if isinstance(value, Enum):
+        return {'__enum__': name, 'value': value.value}
+    if isinstance(value, BaseModel):
+        return {'__model__': name, 'data': value.model_dump(mode='json')}
+    fields = dict(getattr(value, '__dict__', {}))
+    for slot in getattr(cls, '__slots__', ()):
+        if hasattr(value, slot):
+            fields[slot] = getattr(value, slot)
+    return {'__object__': name, 'fields': fields}
+
+
+def _decode_value(value: dict[str, Any]) -> Any:
+    if '__set__' in value:
+        return set(value['__set__'])
+    if '__enum__' in value:
+        return _resolve_type(value['__enum__'], Enum)(value['value'])
+    if '__model__' in value:
+        return _resolve_type(value['__model__'], BaseModel).model_validate(
+            value['data']
+        )
+    if '__object__' in value:
+        cls = _resolve_type(value['__object__'])
+        obj = cls.__new__(cls)
+        for name, item in value['fields'].items():
+            object.__setattr__(obj, name, item)
+        return obj
+    return value
+
+
+def encode_data(data: dict[str, Any]) -> bytes:
+    try:
+        encoded = json.dumps(
+            data, ensure_ascii=False, separators=(',', ':'), default=_encode_value
+        )
+    except (TypeError, ValueError) as e:
+        raise TypeError(f'Session data can not be stored: {e}')
+    return encoded.encode()
+
+
+def decode_data(encoded: bytes) -> dict[str, Any]:
+    return json.loads(encoded, object_hook=_decode_value)
+
+
+class SqliteStorage(BaseStorage):
+    def __init__(
+        self,
+        ttl: float = 86400,
+        cache_size: int = 4096,
+        flush_interval: float = 1,
+        cleanup_interval: float = 3600,
+        key_builder: KeyBuilder | None = None,
+    ):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.cleanup_interval = cleanup_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        # recently used sessions are served from memory, the least recently used ones
+        # are dropped once saved and read from the database again when needed
+        self._records: OrderedDict[str, _Record] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._cleaned_at = 0.0
+        self._flusher: asyncio.Task | None = None
+
+    async def _record(self, key: StorageKey) -> tuple[str, _Record]:
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+        name = self.key_builder.build(key)
+        if name in self._records:
+            self._records.move_to_end(name)
+            return name, self._records[name]
+
+        record = _Record()
+        if stored := await AsyncSessions.load(name):
+            state, encoded, updated_at = stored
+            if time.time() - updated_at < self.ttl:
+                try:
+                    record = _Record(state, decode_data(encoded), encoded, updated_at)
+                except (ValueError, TypeError) as e:
+                    logging.warning(f'Dropped unreadable session {name}: {e!r}')
+        # set meanwhile by another update of the same chat
+        return name, self._records.setdefault(name, record)
+
+    def _save(self, name: str, record: _Record):
+        self._records[name] = record
+        self._records.move_to_end(name)
+        self._dirty.add(name)
+
+    async def set_state(self, key: StorageKey, state: StateType = None):
+        name, record = await self._record(key)
+        state = state.state if isinstance(state, State) else state
+        self._save(name, _Record(state, record.data, record.encoded))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        _, record = await self._record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]):
+        if not isinstance(data, dict):
+            raise TypeError(
+                f'Data must be a dict or dict-like object, got {type(data).__name__}'
+            )
+        # encoded right away, so unserializable data fails in the handler that stored it
+        encoded = encode_data(data)
+        name, record = await self._record(key)
+        self._save(name, _Record(record.state, data.copy(), encoded))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, record = await self._record(key)
+        return record.data.copy()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _shrink(self):
+        excess = len(self._records) - self.cache_size
+        if excess <= 0:
+            return
+        # unsaved changes are kept until the flush has written them
+        for name in list(self._records):
+            if excess <= 0:
+                break
+            if name not in self._dirty:
+                del self._records[name]
+                excess -= 1
+
+    async def flush(self):
+        self._shrink()
+        now = time.time()
+        cleanup = now - self._cleaned_at >= self.cleanup_interval
+        if cleanup:
+            for name, record in list(self._records.items()):
+                if now - record.updated_at >= self.ttl:
+                    del self._records[name]
+                    self._dirty.discard(name)
+        if not self._dirty and not cleanup:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        saved, deleted = [], []
+        for name in dirty:
+            record = self._records.get(name)
+            # cleared sessions stay in memory as empty ones until they expire
+            if record is None or (record.state is None and not record.data):
+                deleted.append(name)
+            else:
+                saved.append((name, record.state, record.encoded, record.updated_at))
+        try:
+            # all changes since the last flush go in one transaction on the writer thread
+            await AsyncSessions.save_many(saved, deleted)
+            if cleanup:
+                self._cleaned_at = now
+                removed = await AsyncSessions.delete_expired(now - self.ttl)
+                if removed > 0:
+                    logging.info(f'Evicted {removed} expired sessions')
+        except Exception as e:
+            logging.error(f'Failed to save {len(saved) + len(deleted)} sessions: {e!r}')
+            # kept dirty, the latest version is saved by the next flush
+            self._dirty |= dirty
+
+    def active_states(self) -> Counter:
+        now = time.time()
+        return Counter(
+            record.state
+            for record in self._records.values()
+            if record.state is not None and now - record.updated_at < self.ttl
+        )
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+
+def create_storage(fsm_config: dict) -> BaseStorage:
+    storage = fsm_config.get('storage', 'sqlite')
+    if storage == 'memory':
+        return MemoryStorage()
+    if storage != 'sqlite':
+        raise ValueError(
+            f'Unknown fsm storage `{storage}`, expected `sqlite` or `memory`'
+        )
+    return SqliteStorage(
+        ttl=fsm_config.get('ttl', 86400),
+        cache_size=fsm_config.get('cache_size', 4096),
+        flush_interval=fsm_config.get('flush_interval', 1),
+        cleanup_interval=fsm_config.get('cleanup_interval', 3600),
+    )
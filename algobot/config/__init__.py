@@ -1,11 +1,15 @@
+import os
 import pathlib
 
 import json5
 
-config_file = pathlib.Path() / 'config' / 'config.json5'
+config_file = pathlib.Path(
+    os.environ.get('ALGOBOT_CONFIG', pathlib.Path() / 'config' / 'config.json5')
+)
 if not config_file.is_file():
     raise FileNotFoundError(
-        'You should place configuration file in <project>/config/config.json5'
+        'You should place configuration file in <project>/config/config.json5 '
+        'or point ALGOBOT_CONFIG to it'
     )
 
 with open(config_file) as config_stream:
@@ -14,3 +18,20 @@ with open(config_file) as config_stream:
 local_config = config_data['local']
 telegram_config = config_data['telegram']
 sheets_config = config_data['sheets']
+
+
+def reload_config():
+    # updated in place, modules hold references to these dicts; values they read
+    # once at startup (ports, pools, quota, fsm storage) keep applying until restart
+    with open(config_file) as stream:
+        data = json5.load(stream)
+    for name, section in (
+        ('local', local_config),
+        ('telegram', telegram_config),
+        ('sheets', sheets_config),
+    ):
+        # read from other threads meanwhile, so keys are replaced one by one and
+        # removed ones dropped last, never leaving a section empty
+        section.update(data[name])
+        for key in section.keys() - data[name].keys():
+            section.pop(key, None)
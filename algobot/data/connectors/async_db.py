@@ -0,0 +1,80 @@
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from typing import Awaitable, Callable, Iterable, TypeVar
+
+from algobot.drivers.sqlite import sqlite_read_executor, sqlite_write_executor
+from .courses import Courses
+from .sessions import Sessions
+from .students import Students
+from .transfers import Transfers
+from .users import Users
+
+T = TypeVar('T')
+
+
+def _run_in(executor: Executor, func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    async def run(*args, **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+    return staticmethod(run)
+
+
+def _reader(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    return _run_in(sqlite_read_executor, func)
+
+
+def _writer(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    return _run_in(sqlite_write_executor, func)
+
+
+def _rows_reader(func: Callable[..., Iterable[T]]) -> Callable[..., Awaitable[list[T]]]:
+    # peewee queries run when iterated, so they are iterated on the reader thread
+    def read(*args, **kwargs) -> list[T]:
+        return list(func(*args, **kwargs))
+
+    return _reader(read)
+
+
+class AsyncUsers:
+    _get_user = _reader(Users.get_user)
+    get_user_by_name = _reader(Users.get_user_by_name)
+    update_tg_data = _writer(Users.update_tg_data)
+    update_tg_data_many = _writer(Users.update_tg_data_many)
+    insert_user = _writer(Users.insert_user)
+    delete_user = _writer(Users.delete_user)
+
+    @staticmethod
+    async def get_user(tg_id: int) -> dict | None:
+        # cache hits are served right on the event loop, without a hop to a reader thread
+        found, user = Users.peek_user(tg_id)
+        if found:
+            return user
+        return await AsyncUsers._get_user(tg_id)
+
+
+class AsyncStudents:
+    list_groups = _reader(Students.list_groups)
+    list_group_students = _reader(Students.list_group_students)
+    get_student_by_name = _reader(Students.get_student_by_name)
+    delete_group_students = _writer(Students.delete_group_students)
+    sync_group_students = _writer(Students.sync_group_students)
+    register_student = _writer(Students.register_student)
+
+
+class AsyncCourses:
+    list_courses = _rows_reader(Courses.list_courses)
+    load_from_config = _writer(Courses.load_from_config)
+
+
+class AsyncTransfers:
+    list_external_course_students = _rows_reader(
+        Transfers.list_external_course_students
+    )
+
+
+class AsyncSessions:
+    load = _reader(Sessions.load)
+    save_many = _writer(Sessions.save_many)
+    delete_expired = _writer(Sessions.delete_expired)
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Callable, TypeVar
+
+from algobot.config import sheets_config
+from algobot.drivers.google import sheets_executor
+from .tables import ChangeMarkingVerdict, MarkStatus, Table, populate_registry
+from .write_queue import WriteQueue
+
+T = TypeVar('T')
+
+
+class AsyncTable:
+    _write_queues: dict[tuple[str, str], WriteQueue] = dict()
+    _warm_up_task: asyncio.Task | None = None
+
+    def __init__(self, table: Table):
+        self.table = table
+        key = (table.sheet_id, table.group_name)
+        if key not in AsyncTable._write_queues:
+            write_batch_config = sheets_config.get('write_batch', {})
+            AsyncTable._write_queues[key] = WriteQueue(
+                table.table,
+                interval=write_batch_config.get('interval', 0.2),
+                max_cells=write_batch_config.get('max_cells', 500),
+            )
+        self.write_queue = AsyncTable._write_queues[key]
+
+    @staticmethod
+    async def _run(func: Callable[..., T], *args, **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            sheets_executor, partial(func, *args, **kwargs)
+        )
+
+    @staticmethod
+    async def get_table(course: str, **kwargs) -> 'AsyncTable':
+        # a table that is warming up is awaited instead of holding a sheets thread
+        loading = Table.find_table(course, **kwargs)
+        if loading is not None:
+            # shielded, a cancelled waiter must not cancel the load shared with others
+            table = await asyncio.shield(asyncio.wrap_future(loading))
+        else:
+            table = await AsyncTable._run(Table.get_table, course, **kwargs)
+        AsyncTable._drop_write_queues()
+        return AsyncTable(table)
+
+    @staticmethod
+    def _drop_write_queues():
+        # queues of evicted worksheets are dropped once everything they got is written
+        loaded = Table.loaded_worksheets()
+        for key, write_queue in list(AsyncTable._write_queues.items()):
+            if key not in loaded and write_queue.idle:
+                del AsyncTable._write_queues[key]
+
+    @staticmethod
+    async def rebuild(course: str, **kwargs) -> 'AsyncTable':
+        table = await AsyncTable._run(Table.rebuild, course, **kwargs)
+        AsyncTable._drop_write_queues()
+        return AsyncTable(table)
+
+    @staticmethod
+    async def evict_changed() -> list[Table]:
+        evicted = await AsyncTable._run(Table.evict_changed)
+        AsyncTable._drop_write_queues()
+        return evicted
+
+    @staticmethod
+    async def warm_up():
+        if AsyncTable._warm_up_task is not None:
+            return
+
+        async def populate():
+            try:
+                await asyncio.to_thread(populate_registry, update_db=False)
+            except Exception:
+                logging.exception('Failed to warm up tables')
+
+        AsyncTable._warm_up_task = asyncio.create_task(populate())
+
+    @staticmethod
+    async def flush_writes():
+        for write_queue in AsyncTable._write_queues.values():
+            await write_queue.flush()
+
+    @property
+    def course(self) -> str:
+        return self.table.course
+
+    @property
+    def group_ids(self) -> list[str]:
+        return self.table.group_ids
+
+    async def reload(self, update_db: bool = True):
+        await self._run(self.table.reload, update_db=update_db)
+
+    async def mark_tasks(
+        self, group: str, student_name: str, tasks: list[tuple[str, str]]
+    ) -> dict[ChangeMarkingVerdict, list]:
+        statistics, cells = await self._run(
+            self.table.mark_tasks, group, student_name, tasks, deferred=True
+        )
+        await self.write_queue.submit(cells)
+        self.table.apply_cells(cells)
+        return statistics
+
+    async def unmark_tasks(
+        self, group: str, student_name: str, tasks: list[tuple[str, str]]
+    ) -> dict[ChangeMarkingVerdict, list]:
+        statistics, cells = await self._run(
+            self.table.unmark_tasks, group, student_name, tasks, deferred=True
+        )
+        await self.write_queue.submit(cells)
+        self.table.apply_cells(cells)
+        return statistics
+
+    async def update_tasks(
+        self, group: str, student_name: str, tasks: list[tuple[str, str, bool]]
+    ) -> dict[ChangeMarkingVerdict, list]:
+        statistics, cells = await self._run(
+            self.table.update_tasks, group, student_name, tasks, deferred=True
+        )
+        await self.write_queue.submit(cells)
+        self.table.apply_cells(cells)
+        return statistics
+
+    def list_weeks(self) -> list[str]:
+        return self.table.list_weeks()
+
+    async def list_available_week_tasks(
+        self, group: str, student_name: str, week: str
+    ) -> list[str]:
+        return await self._run(
+            self.table.list_available_week_tasks, group, student_name, week
+        )
+
+    async def list_recallable_week_tasks(
+        self, group: str, student_name: str, week: str
+    ) -> list[str]:
+        return await self._run(
+            self.table.list_recallable_week_tasks, group, student_name, week
+        )
+
+    async def list_week_tasks(
+        self, group: str, student_name: str, week: str
+    ) -> list[tuple[str, MarkStatus]]:
+        return await self._run(self.table.list_week_tasks, group, student_name, week)
@@ -1,8 +1,9 @@
-from algobot.drivers.sqlite import database
+from algobot.drivers.sqlite import database, instrument_queries
 from algobot.drivers.sqlite.models import Course
 from algobot.config import sheets_config
 
 
+@instrument_queries
 class Courses:
     @staticmethod
     def list_courses() -> list[dict]:
@@ -17,4 +18,3 @@ class Courses:
                 course = course_config['course']
                 for group in course_config['groups']:
                     Course.get_or_create(course=course, group_id=group)
-
@@ -0,0 +1,36 @@
+from peewee import chunked
+
+from algobot.drivers.sqlite import database, instrument_queries
+from algobot.drivers.sqlite.models import Session
+
+
+@instrument_queries
+class Sessions:
+    @staticmethod
+    def load(key: str) -> tuple[str | None, bytes, float] | None:
+        session = Session.get_or_none(Session.key == key)
+        if session is None:
+            return None
+        return session.state, bytes(session.data), session.updated_at
+
+    @staticmethod
+    def save_many(
+        saved: list[tuple[str, str | None, bytes, float]], deleted: list[str]
+    ):
+        with database.atomic():
+            for batch in chunked(saved, 200):
+                Session.replace_many(
+                    batch,
+                    fields=[
+                        Session.key,
+                        Session.state,
+                        Session.data,
+                        Session.updated_at,
+                    ],
+                ).execute()
+            for batch in chunked(deleted, 500):
+                Session.delete().where(Session.key.in_(batch)).execute()
+
+    @staticmethod
+    def delete_expired(before: float) -> int:
+        return Session.delete().where(Session.updated_at < before).execute()
@@ -0,0 +1,35 @@
+import json
+import time
+import zlib
+
+from algobot.drivers.sqlite import instrument_queries
+from algobot.drivers.sqlite.models import Snapshot
+
+
+@instrument_queries
+class Snapshots:
+    @staticmethod
+    def load(
+        sheet_id: str, worksheet: str
+    ) -> tuple[list[list[str]], str | None, float] | None:
+        snapshot = (
+            Snapshot.select()
+            .where((Snapshot.sheet_id == sheet_id) & (Snapshot.worksheet == worksheet))
+            .first()
+        )
+        if snapshot is None:
+            return None
+        values = json.loads(zlib.decompress(snapshot.values))
+        return values, snapshot.update_time, snapshot.fetched_at
+
+    @staticmethod
+    def save(
+        sheet_id: str, worksheet: str, values: list[list[str]], update_time: str | None
+    ):
+        Snapshot.replace(
+            sheet_id=sheet_id,
+            worksheet=worksheet,
+            values=zlib.compress(json.dumps(values, ensure_ascii=False).encode()),
+            update_time=update_time,
+            fetched_at=time.time(),
+        ).execute()
@@ -1,7 +1,13 @@
-from algobot.drivers.sqlite import database
+from typing import Iterable
+
+from peewee import chunked
+
+from algobot.drivers.sqlite import database, instrument_queries
 from algobot.drivers.sqlite.models import Student, User
+from .users import Users
 
 
+@instrument_queries
 class Students:
     @staticmethod
     def list_groups() -> list[str]:
@@ -30,18 +36,53 @@ class Students:
             # TODO notify admin?
             User.delete().where(User.student_ref.in_(students)).execute()
             Student.delete().where(Student.group_id == group_id).execute()
+        Users.forget_group(group_id)
+
+    @staticmethod
+    def sync_group_students(
+        group_ids: list[str], students: Iterable[tuple[str, str]]
+    ) -> tuple[int, int]:
+        roster = [
+            student for student in dict.fromkeys(students) if student[0] in group_ids
+        ]
+        with database.atomic():
+            existing = {
+                (row['group_id'], row['student_name']): row['id_']
+                for row in Student.select(
+                    Student.id_, Student.group_id, Student.student_name
+                )
+                .where(Student.group_id.in_(group_ids))
+                .dicts()
+            }
+            roster_keys = set(roster)
+            removed = [
+                id_ for student, id_ in existing.items() if student not in roster_keys
+            ]
+            added = [student for student in roster if student not in existing]
+
+            # registrations are only dropped for students gone from the sheet
+            for batch in chunked(removed, 500):
+                User.delete().where(User.student_ref.in_(batch)).execute()
+                Student.delete().where(Student.id_.in_(batch)).execute()
+            for batch in chunked(added, 400):
+                Student.insert_many(
+                    batch, fields=[Student.group_id, Student.student_name]
+                ).execute()
+        if len(removed) > 0:
+            for group_id in group_ids:
+                Users.forget_group(group_id)
+        return len(added), len(removed)
 
     @staticmethod
     def get_student_by_name(group_id: str, student_name: str) -> dict | None:
-        rows = (
+        return (
             Student.select()
-            .limit(1)
             .where(
                 (Student.group_id == group_id) & (Student.student_name == student_name)
             )
             .dicts()
+            .first()
         )
-        return rows[0] if len(rows) > 0 else None
 
     @staticmethod
     def register_student(group_id: str, student_name: str):
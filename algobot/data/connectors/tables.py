@@ -1,17 +1,47 @@
+import copy
 import json5
+import logging
+import threading
+import time
 
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from typing import Callable, Type
 from enum import Enum, EnumType
 from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from cachetools.func import ttl_cache
-from gspread.utils import Dimension
+from gspread.utils import Dimension, fill_gaps
 from gspread.cell import Cell
 
 from algobot.config import sheets_config
-from algobot.drivers.google import sheets_driver
+from algobot.drivers.google import sheets_driver, sheets_refresh_executor
+from algobot.drivers.sqlite import run_write
+from algobot.utils.memory import deep_sizeof
+from algobot.utils.metrics import Counter
+from algobot.utils.snapshot_cache import SnapshotCache
+from .snapshots import Snapshots
 from .students import Students
 
+RECENT_WRITES_TTL = 60
+TEMPLATES_DIR = Path() / 'resources' / 'sheets' / 'templates'
+
+tables_evicted = Counter(
+    'algobot_tables_evicted_total',
+    'Tables dropped from the registry by reason',
+    ('reason',),
+)
+
+
+# looked up on every use, the sections are replaced when the config is reloaded
+def cache_config() -> dict:
+    return sheets_config.get('cache', {})
+
+
+def registry_config() -> dict:
+    return sheets_config.get('registry', {})
+
 
 class UnknownCourseError(Exception):
     def __init__(self, course: str, group_ids: list[str]):
@@ -67,37 +97,219 @@ class MarkStatus(Enum):
     EMPTY_LOCKED = 'empty locked'
 
 
-@dataclass
+@dataclass(frozen=True)
 class Mapping:
-    students: list[tuple[str, str]] = field(default_factory=list)
-    weeks: list[str] = field(default_factory=list)
-    weeks_tasks: dict[str, list[str]] = field(default_factory=dict)
+    students: tuple[tuple[str, str], ...] = ()
+    weeks_tasks: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    week_delta: int = 1
+
+    weeks: tuple[str, ...] = field(init=False)
+    week_offsets: tuple[int, ...] = field(init=False)
+    _student_rows: dict[tuple[str, str], int] = field(init=False, repr=False)
+    _week_numbers: dict[str, int] = field(init=False, repr=False)
+    _task_numbers: dict[tuple[str, str], int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # frozen, so indices are set once here and never go out of sync with the data
+        student_rows = {}
+        for row, student in enumerate(self.students):
+            student_rows.setdefault(student, row)
+
+        weeks = tuple(self.weeks_tasks)
+        week_offsets, offset = [], 0
+        task_numbers = {}
+        for week in weeks:
+            week_offsets.append(offset)
+            for number, task in enumerate(self.weeks_tasks[week]):
+                task_numbers.setdefault((week, task), number)
+            offset += len(self.weeks_tasks[week]) + self.week_delta
+
+        object.__setattr__(self, 'weeks', weeks)
+        object.__setattr__(self, 'week_offsets', tuple(week_offsets))
+        object.__setattr__(self, '_student_rows', student_rows)
+        object.__setattr__(
+            self, '_week_numbers', {week: i for i, week in enumerate(weeks)}
+        )
+        object.__setattr__(self, '_task_numbers', task_numbers)
 
     def student_row(self, group: str, student_name: str) -> int:
-        return self.students.index((group, student_name))
+        return self._student_rows[(group, student_name)]
 
     def week_number(self, week: str) -> int:
-        return self.weeks.index(week)
+        return self._week_numbers[week]
 
     def task_number(self, week: str, task: str) -> int:
-        return self.weeks_tasks[week].index(task)
+        return self._task_numbers[(week, task)]
 
     def task_column(self, week: str, task: str) -> int:
-        task_column = 0
-        for other_week in self.weeks:
-            if other_week != week:
-                task_column += len(self.weeks_tasks[other_week]) + 1
-            else:
-                task_column += self.task_number(week, task)
-                break
-        return task_column
+        return (
+            self.week_offsets[self._week_numbers[week]]
+            + self._task_numbers[(week, task)]
+        )
+
+    def week_columns(self, week: str) -> range:
+        offset = self.week_offsets[self._week_numbers[week]]
+        return range(offset, offset + len(self.weeks_tasks[week]))
+
+
+class TableData:
+    def __init__(
+        self,
+        columns: list[list[str]],
+        rows: int,
+        lock_markers: set[str],
+        update_time: str | None = None,
+        offset: int = 0,
+    ):
+        # markers are interned to small codes, columns are stored as arrays of codes
+        self.rows = rows
+        self.lock_markers = lock_markers
+        self.update_time = update_time
+        # index of the first stored column, snapshots of a single week start mid-grid
+        self.offset = offset
+        self.values: list[str] = ['']
+        self.codes: dict[str, int] = {'': 0}
+        wide_columns = []
+        for column in columns:
+            codes = array('I', map(self._intern, column))
+            # trailing empty cells are not returned by the api, so columns are padded
+            codes.extend(array('I', [0]) * (rows - len(codes)))
+            wide_columns.append(codes)
+        typecode = (
+            'B'
+            if len(self.values) <= 0xFF
+            else 'H' if len(self.values) <= 0xFFFF else 'I'
+        )
+        self.columns = [array(typecode, codes) for codes in wide_columns]
+
+        lock_codes = [
+            self.codes[marker] for marker in lock_markers if marker in self.codes
+        ]
+        self.locked = bytearray(
+            any(codes.count(code) for code in lock_codes) for codes in self.columns
+        )
+
+    def with_markers(self, markers: dict[tuple[int, int], str]) -> 'TableData':
+        # snapshots are shared between threads, so changes are applied to a copy
+        changes = [
+            (column - self.offset, row, marker)
+            for (column, row), marker in markers.items()
+            if column >= self.offset and 0 <= row < self.rows
+        ]
+        if not changes:
+            return self
+
+        table_data = copy.copy(self)
+        table_data.values = list(self.values)
+        table_data.codes = dict(self.codes)
+        table_data.columns = list(self.columns)
+        table_data.locked = bytearray(self.locked)
+        codes = [
+            (column, row, table_data._intern(marker)) for column, row, marker in changes
+        ]
+
+        typecode = self.columns[0].typecode if self.columns else 'B'
+        if len(table_data.values) > (1 << 8 * array(typecode).itemsize):
+            typecode = 'H' if len(table_data.values) <= 0xFFFF else 'I'
+            table_data.columns = [
+                array(typecode, column) for column in table_data.columns
+            ]
+        width = max(column for column, _, _ in codes) + 1
+        while len(table_data.columns) < width:
+            table_data.columns.append(array(typecode, [0]) * self.rows)
+        table_data.locked.extend(
+            bytes(len(table_data.columns) - len(table_data.locked))
+        )
+
+        changed_columns = set()
+        for column, row, code in codes:
+            if column not in changed_columns:
+                table_data.columns[column] = array(typecode, table_data.columns[column])
+                changed_columns.add(column)
+            table_data.columns[column][row] = code
+        lock_codes = [
+            table_data.codes[marker]
+            for marker in self.lock_markers
+            if marker in table_data.codes
+        ]
+        for column in changed_columns:
+            table_data.locked[column] = any(
+                table_data.columns[column].count(code) for code in lock_codes
+            )
+        return table_data
+
+    def _intern(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def marker(self, column: int, row: int) -> str:
+        column -= self.offset
+        if not 0 <= column < len(self.columns):
+            return ''
+        return self.values[self.columns[column][row]]
+
+    def is_locked(self, column: int) -> bool:
+        column -= self.offset
+        return 0 <= column < len(self.locked) and self.locked[column] != 0
+
+    def row_markers(self, row: int, columns: range) -> list[str]:
+        values, offset, width = self.values, self.offset, len(self.columns)
+        return [
+            (
+                values[self.columns[column - offset][row]]
+                if 0 <= column - offset < width
+                else ''
+            )
+            for column in columns
+        ]
+
+    def locked_columns(self, columns: range) -> list[bool]:
+        return [self.is_locked(column) for column in columns]
+
+
+def _slice_values(
+    values: list[list[str]], rows: slice, columns: slice
+) -> list[list[str]]:
+    # mirrors a range read: the api omits trailing empty cells and rows, gspread pads the rest
+    block = [row[columns] for row in values[rows]]
+    for line in block:
+        while line and line[-1] == '':
+            line.pop()
+    while block and not block[-1]:
+        block.pop()
+    return fill_gaps(block)
+
+
+def _markers_within(
+    markers: dict[tuple[int, int], str], columns: range
+) -> dict[tuple[int, int], str]:
+    return {
+        (column, row): marker
+        for (column, row), marker in markers.items()
+        if column in columns
+    }
 
 
 class Table:
-    _instances = dict()
+    # least recently used first, loads in flight are never evicted
+    _instances: OrderedDict[tuple[str, tuple[str, ...]], Future] = OrderedDict()
+    _last_used: dict[tuple[str, tuple[str, ...]], float] = dict()
+    _instances_lock = threading.Lock()
+    _spreadsheets: dict[str, Future] = dict()
+    _spreadsheets_lock = threading.Lock()
+    _update_times: SnapshotCache[str] = SnapshotCache(
+        ttl=cache_config().get('probe_ttl', 1)
+    )
+    _caches: dict[tuple[str, str], SnapshotCache] = dict()
+    _caches_lock = threading.Lock()
 
     @staticmethod
-    def get_table(course: str, **kwargs) -> 'Table':
+    def _table_key(
+        course: str, **kwargs
+    ) -> tuple[tuple[str, tuple[str, ...]], list[str]]:
         if len(kwargs) != 1 or ('group_id' not in kwargs and 'group_ids' not in kwargs):
             raise ValueError(
                 'Expected either `group_id: str` or `group_ids: list[str]`'
@@ -105,34 +317,214 @@ class Table:
         group_ids = kwargs.get('group_ids', [kwargs.get('group_id')])
         if len(group_ids) == 0:
             raise ValueError('Expected at least one group per table')
+        return (course, tuple(sorted(group_ids))), group_ids
+
+    @staticmethod
+    def get_table(course: str, restore: bool = True, **kwargs) -> 'Table':
+        key, group_ids = Table._table_key(course, **kwargs)
+        with Table._instances_lock:
+            loading = Table._instances.get(key)
+            owner = loading is None
+            if owner:
+                loading = Table._instances[key] = Future()
+                # shared by every waiter, none of them may cancel it for the others
+                loading.set_running_or_notify_cancel()
+            Table._touch(key)
+        if not owner:
+            return loading.result()
+
+        # tables are built outside the lock so that different tables load in parallel
+        try:
+            table = Table(course, group_ids, restore)
+        except BaseException as e:
+            with Table._instances_lock:
+                if Table._instances.get(key) is loading:
+                    del Table._instances[key]
+                    Table._last_used.pop(key, None)
+            loading.set_exception(e)
+            raise
+        loading.set_result(table)
+        with Table._instances_lock:
+            Table._evict_unused()
+        return table
 
-        key = (course, tuple(sorted(group_ids)))
-        if key not in Table._instances:
-            Table._instances[key] = Table(course, group_ids)
-        return Table._instances[key]
+    @staticmethod
+    def find_table(course: str, **kwargs) -> Future | None:
+        key, _ = Table._table_key(course, **kwargs)
+        with Table._instances_lock:
+            loading = Table._instances.get(key)
+            if loading is not None:
+                Table._touch(key)
+            # lookups run on every update, so idle tables go even when nothing new is loaded
+            Table._evict_unused()
+            return loading
 
-    def __init__(self, course: str, group_ids: list[str]):
-        self.group_ids = group_ids
-        self.course = course
-        self.config = None
+    @staticmethod
+    def _touch(key: tuple[str, tuple[str, ...]]):
+        Table._instances.move_to_end(key)
+        Table._last_used[key] = time.monotonic()
+
+    @staticmethod
+    def _evict_unused():
+        max_tables = registry_config().get('max_tables', 128)
+        idle_ttl = registry_config().get('idle_ttl', 0)
+        now = time.monotonic()
+        evicted = False
+        for key, loading in list(Table._instances.items()):
+            over_capacity = len(Table._instances) > max_tables
+            idle = idle_ttl > 0 and now - Table._last_used[key] > idle_ttl
+            if not over_capacity and not idle:
+                break
+            # tables with writes in flight keep them until the sheet is sure to have them
+            if not loading.done() or loading.result().has_recent_writes():
+                continue
+            Table._drop(key, 'capacity' if over_capacity else 'idle')
+            evicted = True
+        if evicted:
+            Table._release()
+
+    @staticmethod
+    def _drop(key: tuple[str, tuple[str, ...]], reason: str) -> 'Table':
+        table = Table._instances.pop(key).result()
+        Table._last_used.pop(key, None)
+        tables_evicted.inc(reason=reason)
+        logging.info(f'Evicted table {table.course} {table.group_ids} ({reason})')
+        return table
+
+    @staticmethod
+    def _release():
+        # called under the registry lock, so no table starts loading meanwhile;
+        # loads in flight may already hold a cache, the sweep waits for a later eviction then
+        if not all(loading.done() for loading in Table._instances.values()):
+            return
+        remaining = [loading.result() for loading in Table._instances.values()]
+        worksheets = {(table.sheet_id, table.group_name) for table in remaining}
+        sheet_ids = {table.sheet_id for table in remaining}
+        with Table._caches_lock:
+            for key in list(Table._caches):
+                if key not in worksheets:
+                    del Table._caches[key]
+        with Table._spreadsheets_lock:
+            for sheet_id in list(Table._spreadsheets):
+                if sheet_id not in sheet_ids and Table._spreadsheets[sheet_id].done():
+                    del Table._spreadsheets[sheet_id]
+                    Table._update_times.invalidate(sheet_id)
+
+    @staticmethod
+    def evict(course: str, **kwargs) -> bool:
+        key, _ = Table._table_key(course, **kwargs)
+        with Table._instances_lock:
+            loading = Table._instances.get(key)
+            if loading is None or not loading.done():
+                return False
+            Table._drop(key, 'invalidated')
+            Table._release()
+        return True
+
+    @staticmethod
+    def rebuild(course: str, **kwargs) -> 'Table':
+        # an explicit rebuild reads the sheet live instead of restoring the saved snapshot
+        Table.evict(course, **kwargs)
+        table = Table.get_table(course, restore=False, **kwargs)
+        if table.restored:
+            # joined a load that was already in flight and restored a snapshot
+            table.reload(update_db=False)
+        return table
+
+    @staticmethod
+    def evict_changed() -> list['Table']:
+        # tables whose course config or template differ from the current ones
+        with Table._instances_lock:
+            evicted = [
+                Table._drop(key, 'invalidated')
+                for key, loading in list(Table._instances.items())
+                if loading.done() and loading.result().is_outdated()
+            ]
+            if evicted:
+                Table._release()
+        return evicted
+
+    @staticmethod
+    def loaded_worksheets() -> set[tuple[str, str]]:
+        with Table._instances_lock:
+            return {
+                (loading.result().sheet_id, loading.result().group_name)
+                for loading in Table._instances.values()
+                if loading.done()
+            }
+
+    @staticmethod
+    def registry_report() -> list[tuple['Table', float, dict[str, int]]]:
+        now = time.monotonic()
+        with Table._instances_lock:
+            tables = [
+                (loading.result(), now - Table._last_used.get(key, now))
+                for key, loading in reversed(Table._instances.items())
+                if loading.done()
+            ]
+        return [(table, idle, table.memory_usage()) for table, idle in tables]
+
+    @staticmethod
+    def get_spreadsheet(sheet_id: str):
+        with Table._spreadsheets_lock:
+            opening = Table._spreadsheets.get(sheet_id)
+            owner = opening is None
+            if owner:
+                opening = Table._spreadsheets[sheet_id] = Future()
+                opening.set_running_or_notify_cancel()
+        if not owner:
+            return opening.result()
+
+        try:
+            spreadsheet = sheets_driver.open_by_key(sheet_id)
+        except BaseException as e:
+            with Table._spreadsheets_lock:
+                if Table._spreadsheets.get(sheet_id) is opening:
+                    del Table._spreadsheets[sheet_id]
+            opening.set_exception(e)
+            raise
+        opening.set_result(spreadsheet)
+        return spreadsheet
+
+    @staticmethod
+    def get_cache(sheet_id: str, worksheet_name: str) -> SnapshotCache:
+        key = (sheet_id, worksheet_name)
+        with Table._caches_lock:
+            if key not in Table._caches:
+                Table._caches[key] = SnapshotCache(
+                    ttl=cache_config().get('ttl', 2),
+                    stale_ttl=cache_config().get('stale_ttl', 0),
+                    refresh_executor=sheets_refresh_executor,
+                )
+            return Table._caches[key]
+
+    @staticmethod
+    def find_config(course: str, group_ids: list[str]) -> dict:
+        config = None
         for course_config in sheets_config['courses']:
             if course_config['course'] == course and all(
-                    [group_id in course_config['groups'] for group_id in self.group_ids]
+                [group_id in course_config['groups'] for group_id in group_ids]
             ):
-                if self.config:
-                    raise MultipleCoursesError(course, self.group_ids)
-                self.config = course_config
-        if not self.config:
-            raise UnknownCourseError(course, self.group_ids)
+                if config:
+                    raise MultipleCoursesError(course, group_ids)
+                config = course_config
+        if not config:
+            raise UnknownCourseError(course, group_ids)
+        return config
+
+    def __init__(self, course: str, group_ids: list[str], restore: bool = True):
+        self.group_ids = group_ids
+        self.course = course
+        self.config = Table.find_config(course, group_ids)
 
         self.sheet_id = self.config['sheet_id']
-        self.spreadsheet = sheets_driver.open_by_key(self.sheet_id)
+        self.spreadsheet = Table.get_spreadsheet(self.sheet_id)
 
-        templates_dir = Path() / 'resources' / 'sheets' / 'templates'
         template_name = self.config['template']
-        template_path = templates_dir / f'{template_name}.json5'
+        template_path = TEMPLATES_DIR / f'{template_name}.json5'
         if not template_path.is_file():
             raise UnknownTemplateError(template_name)
+        self.template_mtime = template_path.stat().st_mtime
         with open(template_path, encoding='utf-8') as template_file:
             self.template = json5.load(template_file)
 
@@ -148,9 +540,17 @@ class Table:
                 raise InconsistentMappingError(self.group_ids, group_names)
             self.group_name = group_names.pop()
         self.table = self.spreadsheet.worksheet(self.group_name)
+        self.cache = Table.get_cache(self.sheet_id, self.group_name)
         self.markers = self._create_markers()
+        self._cache_marker_values()
         self.mapping = None
-        self.reload(update_db=False)
+        # successful writes are kept for a while to patch snapshots read concurrently with them
+        self._recent_writes: list[tuple[float, dict[tuple[int, int], str]]] = []
+        self._writes_lock = threading.Lock()
+        # a persisted snapshot serves requests while the live sheet is read in background
+        self.restored = restore and self._restore_snapshot()
+        if not self.restored:
+            self.reload(update_db=False)
 
     def _create_markers(self) -> EnumType:
         markers = {item.name: item.value for item in DefaultCellMarker}
@@ -159,16 +559,25 @@ class Table:
                 markers[name.upper()] = value
         return Enum('CellStatus', markers)
 
+    # noinspection PyUnresolvedReferences
+    def _cache_marker_values(self):
+        # enum member lookups are slow on hot paths, plain strings are compared instead
+        self.lock_markers = {
+            self.markers.CHOSEN.value,
+            self.markers.FULL.value,
+            self.markers.HALF.value,
+        }
+        self.locked_marks = self.lock_markers | {self.markers.FAIL.value}
+        self.none_marker = self.markers.NONE.value
+        self.empty_marks = {self.markers.FAIL.value, self.markers.THINK.value}
+
     @staticmethod
     def a1r1_notation(row: int, column: int):
         alpha = ord('Z') - ord('A') + 1
-        column -= 1
         column_name = ''
         while column > 0:
-            column_name += chr(ord('A') + column % alpha)
-            column //= alpha
-        if column_name == '':
-            column_name = 'A'
+            column, letter = divmod(column - 1, alpha)
+            column_name += chr(ord('A') + letter)
         return f'${column_name[::-1]}${row}'
 
     @property
@@ -195,40 +604,85 @@ class Table:
     def week_delta(self) -> int:
         return self.template['week_delta']
 
-    @ttl_cache(maxsize=10, ttl=2)
-    def get_table_values(self, *args, **kwargs):
-        return self.table.get_values(*args, **kwargs)
-
-    def get_table_data(self, major_dimension: Dimension) -> list[list]:
-        return self.get_table_values(
-            f'{Table.a1r1_notation(self.header_rows + 1, self.index_columns + 1)}:'
-            f'{Table.a1r1_notation(self.header_rows + len(self.mapping.students), self.table.col_count)}',
-            major_dimension=major_dimension,
+    def _grid_range(self, rows: int, columns: range) -> str:
+        first_column = self.index_columns + columns.start + 1
+        last_column = self.index_columns + max(columns.stop, columns.start + 1)
+        return (
+            f'{Table.a1r1_notation(self.header_rows + 1, first_column)}:'
+            f'{Table.a1r1_notation(self.header_rows + rows, last_column)}'
         )
 
-    def _reload_header(self):
-        header: list[list] = self.get_table_values(
-            f'{Table.a1r1_notation(1, 1)}:'
-            f'{Table.a1r1_notation(self.header_rows, self.table.col_count)}'
+    def get_week_data(self, week: str, allow_stale: bool = True) -> TableData:
+        mapping = self.mapping
+        rows = len(mapping.students)
+        columns = mapping.week_columns(week)
+        return self._get_snapshot(
+            self._grid_range(rows, columns), rows, columns, allow_stale=allow_stale
         )
+
+    def _get_snapshot(
+        self, range_name: str, rows: int, columns: range, allow_stale: bool = True
+    ) -> TableData:
+        key = (range_name, TableData)
+
+        def read(update_time: str | None) -> TableData:
+            started = time.monotonic()
+            values = self.table.get_values(range_name, major_dimension=Dimension.cols)
+            table_data = TableData(
+                values, rows, self.lock_markers, update_time, columns.start
+            )
+            return table_data.with_markers(
+                _markers_within(self._writes_since(started), columns)
+            )
+
+        def load() -> TableData:
+            update_time = self._probe_update_time()
+            previous = self.cache.peek(key)
+            if (
+                update_time is not None
+                and previous is not None
+                and previous.update_time == update_time
+            ):
+                # the spreadsheet has not changed since the snapshot was read, it is kept as is
+                return previous
+            return read(update_time)
+
+        if not allow_stale:
+            # commits are checked against a live read, the modification time lags behind edits
+            table_data = read(None)
+            self.cache.put(key, table_data)
+            return table_data
+        return self.cache.get(key, load)
+
+    def _probe_update_time(self) -> str | None:
+        if not cache_config().get('probe_changes', False):
+            return None
+        Table._update_times.ttl = cache_config().get('probe_ttl', 1)
+        try:
+            return Table._update_times.get(
+                self.sheet_id, self.spreadsheet.get_lastUpdateTime
+            )
+        except Exception as e:
+            logging.warning(
+                f'Failed to probe spreadsheet {self.sheet_id} for changes: {e!r}'
+            )
+            return None
+
+    def _reload_header(self, header: list[list]) -> dict[str, tuple[str, ...]]:
+        weeks_tasks = {}
         week_name, tasks = '', []
         for column in range(self.index_columns, len(header[0])):
             if header[self.week_row][column] != '':
                 if len(tasks) > 0:
-                    self.mapping.weeks.append(week_name)
-                    self.mapping.weeks_tasks[week_name] = tasks[: -self.week_delta]
+                    weeks_tasks[week_name] = tuple(tasks[: -self.week_delta])
                 week_name = header[self.week_row][column]
                 tasks = [header[self.tasks_row][column]]
             else:
                 tasks.append(header[self.tasks_row][column])
-        self.mapping.weeks.append(week_name)
-        self.mapping.weeks_tasks[week_name] = tasks[: -self.week_delta]
+        weeks_tasks[week_name] = tuple(tasks[: -self.week_delta])
+        return weeks_tasks
 
-    def _reload_index(self):
-        index = self.get_table_values(
-            f'{Table.a1r1_notation(1, 1)}:'
-            f'{Table.a1r1_notation(self.table.row_count, self.index_columns)}'
-        )
+    def _reload_index(self, index: list[list]) -> tuple[tuple[str, str], ...]:
         group_column = (
             None
             if 'group_column' not in self.template
@@ -241,51 +695,205 @@ class Table:
                 return row >= len(index) - footer_rows
             return eval(footer_rows['condition'].replace('$', repr(index[row][0])))
 
+        students = []
         for row in range(self.header_rows, len(index)):
             if footer_condition(row):
                 break
             student_name = index[row][self.name_column]
             group = index[row][group_column] if group_column else self.group_ids[0]
-            self.mapping.students.append((group, student_name))
+            students.append((group, student_name))
+        return tuple(students)
 
     def reload(self, update_db: bool = True):
-        self.mapping = Mapping()
-        self._reload_header()
-        self._reload_index()
+        self.cache.invalidate()
+        # header, index and grid are sliced from a single read of the whole worksheet
+        update_time = self._probe_update_time()
+        started = time.monotonic()
+        values = self.table.get_values()
+        self._apply_values(values, update_time)
+        self._write_through(self._writes_since(started))
+        if cache_config().get('persist', False):
+            try:
+                run_write(
+                    Snapshots.save, self.sheet_id, self.group_name, values, update_time
+                )
+            except Exception as e:
+                logging.warning(
+                    f'Failed to save snapshot of {self.sheet_id}/{self.group_name}: {e!r}'
+                )
         if update_db:
-            for group_id in self.group_ids:
-                Students.delete_group_students(group_id)
-            for group, student_name in self.mapping.students:
-                Students.register_student(group, student_name)
+            self.sync_students()
+
+    def _restore_snapshot(self) -> bool:
+        if not cache_config().get('persist', False):
+            return False
+        snapshot = Snapshots.load(self.sheet_id, self.group_name)
+        if snapshot is None:
+            return False
+        values, update_time, fetched_at = snapshot
+        try:
+            # possibly hours old, so it is cached as expired and only serves stale-tolerant reads
+            self._apply_values(values, update_time, expired=True)
+        except Exception as e:
+            logging.warning(
+                f'Failed to restore snapshot of {self.sheet_id}/{self.group_name}: {e!r}'
+            )
+            return False
+        logging.info(
+            f'Restored snapshot of {self.sheet_id}/{self.group_name} '
+            f'fetched {time.time() - fetched_at:.0f}s ago'
+        )
+        sheets_refresh_executor.submit(self._reconcile, update_time)
+        return True
+
+    def _reconcile(self, update_time: str | None):
+        try:
+            if update_time is not None and self._probe_update_time() == update_time:
+                return
+            self.reload(update_db=False)
+        except Exception:
+            logging.exception(
+                f'Failed to reconcile snapshot of {self.sheet_id}/{self.group_name}'
+            )
 
-    # noinspection PyUnresolvedReferences
-    def _mark_status(self, column_data: list, row: int) -> MarkStatus:
-        marker = column_data[row]
-
-        if marker != self.markers.NONE.value:
-            if marker in (
-                    self.markers.CHOSEN.value,
-                    self.markers.FULL.value,
-                    self.markers.HALF.value,
-                    self.markers.FAIL.value
-            ):
+    def _apply_values(
+        self, values: list[list[str]], update_time: str | None, expired: bool = False
+    ):
+        students = self._reload_index(
+            _slice_values(values, slice(None), slice(None, self.index_columns))
+        )
+        grid = _slice_values(
+            values,
+            slice(self.header_rows, self.header_rows + len(students)),
+            slice(self.index_columns, None),
+        )
+        # built aside and swapped, reads from other sheets threads may be in flight
+        mapping = Mapping(
+            weeks_tasks=self._reload_header(
+                _slice_values(values, slice(None, self.header_rows), slice(None))
+            ),
+            students=students,
+            week_delta=self.week_delta,
+        )
+        grid_columns = [list(column) for column in zip(*grid)]
+        for week in mapping.weeks:
+            columns = mapping.week_columns(week)
+            self.cache.put(
+                (self._grid_range(len(students), columns), TableData),
+                TableData(
+                    grid_columns[columns.start : columns.stop],
+                    len(students),
+                    self.lock_markers,
+                    update_time,
+                    columns.start,
+                ),
+                expired=expired,
+            )
+        self.mapping = mapping
+
+    def apply_cells(self, cells: list[Cell]):
+        markers = {
+            (
+                cell.col - self.index_columns - 1,
+                cell.row - self.header_rows - 1,
+            ): cell.value
+            for cell in cells
+        }
+        written_at = time.monotonic()
+        with self._writes_lock:
+            self._recent_writes = [
+                write
+                for write in self._recent_writes
+                if write[0] > written_at - RECENT_WRITES_TTL
+            ]
+            self._recent_writes.append((written_at, markers))
+        self._write_through(markers)
+
+    def has_recent_writes(self) -> bool:
+        with self._writes_lock:
+            return any(
+                written_at > time.monotonic() - RECENT_WRITES_TTL
+                for written_at, _ in self._recent_writes
+            )
+
+    def is_outdated(self) -> bool:
+        # groups added to or removed from the course do not change tables of the other groups
+        def settings(config: dict) -> dict:
+            return {name: value for name, value in config.items() if name != 'groups'}
+
+        try:
+            config = Table.find_config(self.course, self.group_ids)
+            template_path = TEMPLATES_DIR / f'{config["template"]}.json5'
+            return (
+                settings(config) != settings(self.config)
+                or template_path.stat().st_mtime != self.template_mtime
+            )
+        except (UnknownCourseError, MultipleCoursesError, OSError):
+            return True
+
+    def memory_usage(self) -> dict[str, int]:
+        # approximate, snapshots of a worksheet shared by several tables are counted for each
+        seen = set()
+        return {
+            'mapping': deep_sizeof(self.mapping, seen),
+            'snapshots': sum(deep_sizeof(value, seen) for value in self.cache.values()),
+            'template': deep_sizeof(self.template, seen),
+            'writes': deep_sizeof(self._recent_writes, seen),
+        }
+
+    def _writes_since(self, started: float) -> dict[tuple[int, int], str]:
+        # writes finished after a read started may be missing from it, reapplying them is harmless
+        markers = {}
+        with self._writes_lock:
+            for written_at, write in self._recent_writes:
+                if written_at >= started:
+                    markers.update(write)
+        return markers
+
+    def _write_through(self, markers: dict[tuple[int, int], str]):
+        if not markers:
+            return
+        mapping = self.mapping
+        rows = len(mapping.students)
+        for week in mapping.weeks:
+            columns = mapping.week_columns(week)
+            if week_markers := _markers_within(markers, columns):
+                self.cache.update(
+                    (self._grid_range(rows, columns), TableData),
+                    partial(TableData.with_markers, markers=week_markers),
+                )
+
+    def sync_students(self):
+        added, removed = run_write(
+            Students.sync_group_students, self.group_ids, self.mapping.students
+        )
+        logging.info(
+            f'Synced students of {self.group_ids}: {added} added, {removed} removed'
+        )
+
+    def _mark_status(self, table_data: TableData, column: int, row: int) -> MarkStatus:
+        return self._marker_status(
+            table_data.marker(column, row), table_data.is_locked(column)
+        )
+
+    def _marker_status(self, marker: str, column_locked: bool) -> MarkStatus:
+        if marker != self.none_marker:
+            if marker in self.locked_marks:
                 return MarkStatus.MARKED_LOCKED
             return MarkStatus.MARKED
 
-        if marker == self.markers.FAIL.value or marker == self.markers.THINK.value:
+        if marker in self.empty_marks:
             return MarkStatus.EMPTY
-        if any(value in (
-                self.markers.CHOSEN.value,
-                self.markers.FULL.value,
-                self.markers.HALF.value
-        ) for value in column_data):
+        if column_locked:
             return MarkStatus.EMPTY_LOCKED
 
         return MarkStatus.EMPTY
 
     # noinspection PyUnresolvedReferences
-    def _check_marking(self, column_data: list, row: int) -> ChangeMarkingVerdict:
-        status = self._mark_status(column_data, row)
+    def _check_marking(
+        self, table_data: TableData, column: int, row: int
+    ) -> ChangeMarkingVerdict:
+        status = self._mark_status(table_data, column, row)
         if status == MarkStatus.EMPTY:
             return ChangeMarkingVerdict.OK
         if status == MarkStatus.EMPTY_LOCKED:
@@ -293,8 +901,10 @@ class Table:
         return ChangeMarkingVerdict.NO_CHANGES
 
     # noinspection PyUnresolvedReferences
-    def _check_unmarking(self, column_data: list, row: int) -> ChangeMarkingVerdict:
-        status = self._mark_status(column_data, row)
+    def _check_unmarking(
+        self, table_data: TableData, column: int, row: int
+    ) -> ChangeMarkingVerdict:
+        status = self._mark_status(table_data, column, row)
         if status == MarkStatus.MARKED:
             return ChangeMarkingVerdict.OK
         if status == MarkStatus.MARKED_LOCKED:
@@ -302,24 +912,28 @@ class Table:
         return ChangeMarkingVerdict.NO_CHANGES
 
     def _update_tasks(
-            self,
-            group: str,
-            student_name: str,
-            tasks: dict[tuple[str, str], DefaultCellMarker],
-            checker: Callable[[list, int], ChangeMarkingVerdict],
+        self,
+        group: str,
+        student_name: str,
+        tasks: dict[tuple[str, str], DefaultCellMarker],
+        checker: Callable[[TableData, int, int], ChangeMarkingVerdict],
+        deferred: bool = False,
     ):
-        table_data = self.get_table_data(major_dimension=Dimension.cols)
+        # marks are checked against fresh data only, stale snapshots are for menus
+        weeks_data = {
+            week: self.get_week_data(week, allow_stale=False) for week, _ in tasks
+        }
         student_row = self.mapping.student_row(group, student_name)
         statistics = {status: [] for status in ChangeMarkingVerdict}
 
         for task_ref, new_marker in tasks.items():
             week, task = task_ref
+            table_data = weeks_data[week]
             task_column = self.mapping.task_column(week, task)
-            column_data = table_data[task_column]
             status = (
                 ChangeMarkingVerdict.NO_CHANGES
-                if column_data[student_row] == new_marker.value
-                else checker(column_data, student_row)
+                if table_data.marker(task_column, student_row) == new_marker.value
+                else checker(table_data, task_column, student_row)
             )
             statistics[status].append((week, task, task_column))
 
@@ -331,104 +945,181 @@ class Table:
             )
             for week, task, column in statistics[ChangeMarkingVerdict.OK]
         ]
+        if deferred:
+            return statistics, cells
         if len(cells) > 0:
             self.table.update_cells(cells)
+            self.apply_cells(cells)
         return statistics
 
     # noinspection PyUnresolvedReferences
-    def mark_tasks(self, group: str, student_name: str, tasks: list[tuple[str, str]]):
+    def mark_tasks(
+        self,
+        group: str,
+        student_name: str,
+        tasks: list[tuple[str, str]],
+        deferred: bool = False,
+    ):
         return self._update_tasks(
-            group, student_name, {
-                task: self.markers.SOLVED
-                for task in tasks
-            }, self._check_marking
+            group,
+            student_name,
+            {task: self.markers.SOLVED for task in tasks},
+            self._check_marking,
+            deferred,
         )
 
     # noinspection PyUnresolvedReferences
-    def unmark_tasks(self, group: str, student_name: str, tasks: list[tuple[str, str]]):
+    def unmark_tasks(
+        self,
+        group: str,
+        student_name: str,
+        tasks: list[tuple[str, str]],
+        deferred: bool = False,
+    ):
         return self._update_tasks(
-            group, student_name, {
-                task: self.markers.NONE
-                for task in tasks
-            }, self._check_unmarking
+            group,
+            student_name,
+            {task: self.markers.NONE for task in tasks},
+            self._check_unmarking,
+            deferred,
         )
 
     # noinspection PyUnresolvedReferences
-    def update_tasks(self, group: str, student_name: str, tasks: list[tuple[str, str, bool]]):
-        def _check_task(column_data: list, row: int) -> ChangeMarkingVerdict:
-            status = self._mark_status(column_data, row)
+    def update_tasks(
+        self,
+        group: str,
+        student_name: str,
+        tasks: list[tuple[str, str, bool]],
+        deferred: bool = False,
+    ):
+        def _check_task(
+            table_data: TableData, column: int, row: int
+        ) -> ChangeMarkingVerdict:
+            status = self._mark_status(table_data, column, row)
             if status in (MarkStatus.MARKED_LOCKED, MarkStatus.EMPTY_LOCKED):
                 return ChangeMarkingVerdict.UNAVAILABLE
             return ChangeMarkingVerdict.OK
 
-        return self._update_tasks(group, student_name, {
-            (week, task): self.markers.SOLVED if mark else self.markers.NONE
-            for week, task, mark in tasks
-        }, _check_task)
+        return self._update_tasks(
+            group,
+            student_name,
+            {
+                (week, task): self.markers.SOLVED if mark else self.markers.NONE
+                for week, task, mark in tasks
+            },
+            _check_task,
+            deferred,
+        )
 
     def list_weeks(self) -> list[str]:
-        return self.mapping.weeks
+        return list(self.mapping.weeks)
 
     def _list_filtered_week_tasks(
-            self,
-            group: str,
-            student_name: str,
-            week: str,
-            condition: Callable[[list, int], ChangeMarkingVerdict],
+        self,
+        group: str,
+        student_name: str,
+        week: str,
+        condition: Callable[[TableData, int, int], ChangeMarkingVerdict],
     ) -> list[str]:
         if week not in self.mapping.weeks_tasks:
             return []
-        table_data = self.get_table_data(major_dimension=Dimension.cols)
+        table_data = self.get_week_data(week)
         student_row = self.mapping.student_row(group, student_name)
         return [
             task
             for task in self.mapping.weeks_tasks[week]
-            if condition(table_data[self.mapping.task_column(week, task)], student_row)
-               == ChangeMarkingVerdict.OK
+            if condition(table_data, self.mapping.task_column(week, task), student_row)
+            == ChangeMarkingVerdict.OK
         ]
 
     def list_available_week_tasks(
-            self, group: str, student_name: str, week: str
+        self, group: str, student_name: str, week: str
     ) -> list[str]:
         return self._list_filtered_week_tasks(
             group, student_name, week, self._check_marking
         )
 
     def list_recallable_week_tasks(
-            self, group: str, student_name: str, week: str
+        self, group: str, student_name: str, week: str
     ) -> list[str]:
         return self._list_filtered_week_tasks(
             group, student_name, week, self._check_unmarking
         )
 
     def list_week_tasks(
-            self, group: str, student_name: str, week: str
+        self, group: str, student_name: str, week: str
     ) -> list[tuple[str, MarkStatus]]:
         if week not in self.mapping.weeks_tasks:
             return []
-        table_data = self.get_table_data(major_dimension=Dimension.cols)
+        table_data = self.get_week_data(week)
         student_row = self.mapping.student_row(group, student_name)
 
-        tasks = []
-        for task in self.mapping.weeks_tasks[week]:
-            column = self.mapping.task_column(week, task)
-            column_data = table_data[column]
-            tasks.append((task, self._mark_status(column_data, student_row)))
-
-        return tasks
+        columns = self.mapping.week_columns(week)
+        return [
+            (task, self._marker_status(marker, locked))
+            for task, marker, locked in zip(
+                self.mapping.weeks_tasks[week],
+                table_data.row_markers(student_row, columns),
+                table_data.locked_columns(columns),
+            )
+        ]
 
 
-def populate_registry():
+def configured_tables() -> list[tuple[str, list[str]]]:
+    tables = []
     for course_config in sheets_config['courses']:
         course = course_config['course']
         groups = course_config['groups']
-        print(course, groups, flush=True)
         if course_config.get('merged_groups', False):
-            Table.get_table(course, group_ids=groups).reload()
+            tables.append((course, groups))
         else:
-            for group in groups:
-                Table.get_table(course, group_id=group).reload()
+            tables.extend((course, [group]) for group in groups)
+    return tables
+
+
+def _load_table(
+    course: str, group_ids: list[str], restore: bool = True
+) -> tuple[Table, float]:
+    started = time.perf_counter()
+    table = Table.get_table(course, restore=restore, group_ids=group_ids)
+    return table, time.perf_counter() - started
+
+
+def populate_registry(
+    update_db: bool = True, concurrency: int | None = None
+) -> list[Table]:
+    if concurrency is None:
+        concurrency = sheets_config.get('startup_concurrency', 4)
+    started = time.perf_counter()
+    tables, failures = [], 0
+    with ThreadPoolExecutor(concurrency, thread_name_prefix='registry') as executor:
+        # rosters are only synced from live reads, a persisted snapshot may be outdated
+        futures = {}
+        for course, group_ids in configured_tables():
+            future = executor.submit(_load_table, course, group_ids, not update_db)
+            futures[future] = course, group_ids
+        for future in as_completed(futures):
+            course, group_ids = futures[future]
+            try:
+                table, elapsed = future.result()
+                logging.info(f'Loaded table {course} {group_ids} in {elapsed:.2f}s')
+                # a freshly built table is already loaded, sqlite takes one writer at a time
+                if update_db and table.restored:
+                    # the registry already held a table built from a snapshot
+                    table.reload()
+                elif update_db:
+                    table.sync_students()
+                tables.append(table)
+            except Exception:
+                failures += 1
+                logging.exception(f'Failed to load table {course} {group_ids}')
+    logging.info(
+        f'Loaded {len(tables)} tables ({failures} failed) '
+        f'in {time.perf_counter() - started:.2f}s'
+    )
+    return tables
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     populate_registry()
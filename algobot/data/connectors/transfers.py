@@ -1,6 +1,8 @@
+from algobot.drivers.sqlite import instrument_queries
 from algobot.drivers.sqlite.models import Student, Transfer
 
 
+@instrument_queries
 class Transfers:
     @staticmethod
     def list_external_course_students(
@@ -1,31 +1,80 @@
-from algobot.drivers.sqlite import database
+import logging
+import threading
+
+from cachetools import TTLCache
+from peewee import IntegrityError
+
+from algobot.drivers.sqlite import database, instrument_queries
 from algobot.drivers.sqlite.models import Student, User
 
+USERS_CACHE_SIZE = 4096
+USERS_CACHE_TTL = 600
 
+
+@instrument_queries
 class Users:
+    # tg_id -> joined user and student row, None for unregistered users
+    _cache: TTLCache[int, dict | None] = TTLCache(
+        maxsize=USERS_CACHE_SIZE, ttl=USERS_CACHE_TTL
+    )
+    _cache_lock = threading.Lock()
+    _cache_version = 0
+
+    @staticmethod
+    def peek_user(tg_id: int) -> tuple[bool, dict | None]:
+        # cached lookups only, nothing is read from the database
+        with Users._cache_lock:
+            if tg_id in Users._cache:
+                user = Users._cache[tg_id]
+                return True, dict(user) if user else None
+        return False, None
+
     @staticmethod
     def get_user(tg_id: int) -> dict | None:
-        students = (
+        with Users._cache_lock:
+            if tg_id in Users._cache:
+                user = Users._cache[tg_id]
+                return dict(user) if user else None
+            version = Users._cache_version
+
+        user = (
             User.select(User, Student)
             .join(Student)
-            .limit(1)
             .where(User.tg_id == tg_id)
             .dicts()
+            .first()
         )
-        return students[0] if len(students) > 0 else None
+        with Users._cache_lock:
+            # rows read before an invalidation may already be outdated
+            if version == Users._cache_version:
+                Users._cache[tg_id] = user
+        return dict(user) if user else None
+
+    @staticmethod
+    def forget(tg_id: int):
+        with Users._cache_lock:
+            Users._cache_version += 1
+            Users._cache.pop(tg_id, None)
+
+    @staticmethod
+    def forget_group(group_id: str):
+        with Users._cache_lock:
+            Users._cache_version += 1
+            for tg_id, user in list(Users._cache.items()):
+                if user and user['group_id'] == group_id:
+                    del Users._cache[tg_id]
 
     @staticmethod
     def get_user_by_name(group_id: int, student_name: str) -> dict | None:
-        students = (
+        return (
             User.select(User, Student)
             .join(Student)
-            .limit(1)
             .where(
                 (Student.group_id == group_id) & (Student.student_name == student_name)
             )
             .dicts()
+            .first()
         )
-        return students[0] if len(students) > 0 else None
 
     @staticmethod
     def update_tg_data(tg_id: int, tg_username: str, tg_name: str):
@@ -34,6 +83,24 @@ class Users:
                 user.tg_username = tg_username
                 user.tg_name = tg_name
                 user.save()
+        Users.forget(tg_id)
+
+    @staticmethod
+    def update_tg_data_many(profiles: list[tuple[int, str | None, str]]):
+        with database.atomic():
+            for tg_id, tg_username, tg_name in profiles:
+                # a savepoint per profile, one conflicting username must not roll back the batch
+                try:
+                    with database.atomic():
+                        User.update(tg_username=tg_username, tg_name=tg_name).where(
+                            User.tg_id == tg_id
+                        ).execute()
+                except IntegrityError as e:
+                    logging.warning(
+                        f'Skipped telegram profile update of {tg_id}: {e!r}'
+                    )
+        for tg_id, _, _ in profiles:
+            Users.forget(tg_id)
 
     @staticmethod
     def insert_user(
@@ -52,7 +119,9 @@ class Users:
                 student_ref=student.id_,
             ).execute()
             database.cursor().execute(f'PRAGMA foreign_key_check(user)')
+        Users.forget(tg_id)
 
     @staticmethod
     def delete_user(tg_id: int):
         User.delete_by_id(tg_id)
+        Users.forget(tg_id)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from functools import partial
+
+from gspread import Worksheet
+from gspread.cell import Cell
+from gspread.utils import rowcol_to_a1
+
+from algobot.drivers.google import sheets_executor
+
+
+@dataclass
+class _PendingWrite:
+    cells: list[Cell]
+    future: asyncio.Future
+
+
+class WriteQueue:
+    def __init__(self, worksheet: Worksheet, interval: float, max_cells: int):
+        self.worksheet = worksheet
+        self.interval = interval
+        self.max_cells = max_cells
+        self._pending: list[_PendingWrite] = []
+        self._pending_cells = 0
+        self._timer: asyncio.Task | None = None
+        self._flushes: set[asyncio.Task] = set()
+        # batches of one worksheet are written in order, later marks win
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def idle(self) -> bool:
+        return (
+            not self._pending
+            and self._timer is None
+            and not self._flushes
+            and not self._write_lock.locked()
+        )
+
+    async def submit(self, cells: list[Cell]):
+        if len(cells) == 0:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingWrite(cells, future))
+        self._pending_cells += len(cells)
+
+        if self._pending_cells >= self.max_cells:
+            flush = asyncio.create_task(self.flush())
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_cells = self._pending, [], 0
+
+        async with self._write_lock:
+            # an empty flush still waits for the batches already being written
+            if len(batch) == 0:
+                return
+            values = {}
+            for write in batch:
+                for cell in write.cells:
+                    values[(cell.row, cell.col)] = cell.value
+            loop = asyncio.get_running_loop()
+            try:
+                data = [
+                    {'range': rowcol_to_a1(row, col), 'values': [[value]]}
+                    for (row, col), value in values.items()
+                ]
+                await loop.run_in_executor(
+                    sheets_executor, partial(self.worksheet.batch_update, data)
+                )
+            except Exception as e:
+                logging.error(
+                    f'Failed to write {len(values)} cells to `{self.worksheet.title}`: {e!r}'
+                )
+                for write in batch:
+                    if not write.future.done():
+                        write.future.set_exception(e)
+                return
+
+        logging.debug(
+            f'Wrote {len(values)} cells of {len(batch)} commits to `{self.worksheet.title}`'
+        )
+        for write in batch:
+            if not write.future.done():
+                write.future.set_result(None)
@@ -1,10 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from algobot.config import sheets_config
+from .base import BaseSheetsDriver
+from .fake import FakeSheetsDriver
+from .scheduler import QuotaScheduler, ScheduledSheetsDriver
 from .sheets import SheetsDriver
 
+
+class UnknownDriverError(Exception):
+    def __init__(self, driver_name: str):
+        self.driver_name = driver_name
+        super().__init__(f'Unknown sheets driver \'{driver_name}\'')
+
+
 credentials_file = sheets_config['credentials_file']
 credentials_path = Path(credentials_file)
-sheets_driver = None
-if credentials_path.is_file():
+driver_name = sheets_config.get('driver', 'google')
+sheets_driver: BaseSheetsDriver | None = None
+if driver_name == 'fake':
+    sheets_driver = FakeSheetsDriver(**sheets_config.get('fake', {}))
+elif driver_name != 'google':
+    raise UnknownDriverError(driver_name)
+elif credentials_path.is_file():
     sheets_driver = SheetsDriver(credentials_file)
+
+sheets_scheduler: QuotaScheduler | None = None
+if 'quota' in sheets_config:
+    sheets_scheduler = QuotaScheduler(**sheets_config['quota'])
+# calls are always routed through the scheduler proxies, they are timed there
+if sheets_driver is not None:
+    sheets_driver = ScheduledSheetsDriver(sheets_driver, sheets_scheduler)
+
+sheets_executor = ThreadPoolExecutor(
+    max_workers=sheets_config.get('io_workers', 8),
+    thread_name_prefix='sheets',
+)
+# background cache refreshes run separately so they never queue behind their waiters
+sheets_refresh_executor = ThreadPoolExecutor(
+    max_workers=2,
+    thread_name_prefix='sheets-refresh',
+)
@@ -0,0 +1,9 @@
+from abc import ABC, abstractmethod
+
+from gspread import Spreadsheet
+
+
+class BaseSheetsDriver(ABC):
+    @abstractmethod
+    def open_by_key(self, sheet_id: str) -> Spreadsheet:
+        pass
@@ -0,0 +1,210 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import json5
+from gspread.cell import Cell
+from gspread.exceptions import APIError, SpreadsheetNotFound, WorksheetNotFound
+from gspread.utils import Dimension, a1_to_rowcol, fill_gaps
+from requests import Response
+
+from .base import BaseSheetsDriver
+
+
+class FakeWorksheet:
+    def __init__(
+        self, spreadsheet: 'FakeSpreadsheet', title: str, rows: list[list[str]]
+    ):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = [[str(value) for value in row] for row in rows]
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    @property
+    def col_count(self) -> int:
+        return max((len(row) for row in self.rows), default=0)
+
+    @staticmethod
+    def _parse_cell(label: str) -> tuple[int, int]:
+        return a1_to_rowcol(label.replace('$', ''))
+
+    def _parse_range(self, range_name: str | None) -> tuple[int, int, int, int]:
+        if range_name is None:
+            return 1, 1, self.row_count, self.col_count
+        first, _, last = range_name.partition(':')
+        first_row, first_col = self._parse_cell(first)
+        last_row, last_col = self._parse_cell(last) if last else (first_row, first_col)
+        return first_row, first_col, last_row, last_col
+
+    def _cell(self, row: int, col: int) -> str:
+        if row > len(self.rows) or col > len(self.rows[row - 1]):
+            return ''
+        return self.rows[row - 1][col - 1]
+
+    def _set_cell(self, row: int, col: int, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        cells.extend([''] * (col - len(cells)))
+        cells[col - 1] = '' if value is None else str(value)
+
+    def get_values(
+        self,
+        range_name: str | None = None,
+        major_dimension: str | None = None,
+        **kwargs
+    ) -> list[list[str]]:
+        self.spreadsheet.driver.simulate_call('get_values')
+        with self.spreadsheet.driver.lock:
+            first_row, first_col, last_row, last_col = self._parse_range(range_name)
+            values = [
+                [self._cell(row, col) for col in range(first_col, last_col + 1)]
+                for row in range(first_row, last_row + 1)
+            ]
+        if major_dimension in (Dimension.cols, 'COLUMNS'):
+            values = [list(column) for column in zip(*values)]
+
+        # the api omits trailing empty cells and rows, gspread pads the rest
+        for line in values:
+            while line and line[-1] == '':
+                line.pop()
+        while values and not values[-1]:
+            values.pop()
+        return fill_gaps(values)
+
+    def update_cells(self, cell_list: list[Cell], **kwargs):
+        self.spreadsheet.driver.simulate_call('update_cells')
+        with self.spreadsheet.driver.lock:
+            for cell in cell_list:
+                self._set_cell(cell.row, cell.col, cell.value)
+            self.spreadsheet.touch()
+        self.spreadsheet.driver.persist()
+
+    def batch_update(self, data: list[dict], **kwargs):
+        self.spreadsheet.driver.simulate_call('batch_update')
+        with self.spreadsheet.driver.lock:
+            for update in data:
+                first_row, first_col, _, _ = self._parse_range(update['range'])
+                for row, line in enumerate(update['values']):
+                    for col, value in enumerate(line):
+                        self._set_cell(first_row + row, first_col + col, value)
+            self.spreadsheet.touch()
+        self.spreadsheet.driver.persist()
+
+
+class FakeSpreadsheet:
+    def __init__(
+        self,
+        driver: 'FakeSheetsDriver',
+        sheet_id: str,
+        worksheets: dict[str, list],
+        modified_at: float | None = None,
+    ):
+        self.driver = driver
+        self.id = sheet_id
+        self.worksheets = {
+            title: FakeWorksheet(self, title, rows)
+            for title, rows in worksheets.items()
+        }
+        self.touch(modified_at)
+
+    def touch(self, modified_at: float | None = None):
+        modified = datetime.fromtimestamp(
+            time.time() if modified_at is None else modified_at, timezone.utc
+        )
+        self.modified_time = modified.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+    def get_lastUpdateTime(self) -> str:
+        self.driver.simulate_call('get_lastUpdateTime')
+        with self.driver.lock:
+            return self.modified_time
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.driver.simulate_call('worksheet')
+        if title not in self.worksheets:
+            raise WorksheetNotFound(title)
+        return self.worksheets[title]
+
+
+class FakeSheetsDriver(BaseSheetsDriver):
+    def __init__(
+        self,
+        data: dict[str, dict[str, list]] | None = None,
+        source: str | None = None,
+        persist: bool = False,
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+    ):
+        modified_at = None
+        if source is not None:
+            with open(source, encoding='utf-8') as source_file:
+                data = json5.load(source_file)
+            modified_at = Path(source).stat().st_mtime
+        self.source = source
+        self.should_persist = persist and source is not None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.lock = threading.RLock()
+        self.spreadsheets = {
+            sheet_id: FakeSpreadsheet(self, sheet_id, worksheets, modified_at)
+            for sheet_id, worksheets in (data or {}).items()
+        }
+
+    @staticmethod
+    def quota_error() -> APIError:
+        response = Response()
+        response.status_code = 429
+        response._content = json.dumps(
+            {
+                'error': {
+                    'code': 429,
+                    'message': 'Quota exceeded (simulated by fake sheets driver)',
+                    'status': 'RESOURCE_EXHAUSTED',
+                }
+            }
+        ).encode()
+        return APIError(response)
+
+    def simulate_call(self, method: str):
+        with self.lock:
+            self.calls[method] += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate > 0 and random.random() < self.error_rate:
+            raise FakeSheetsDriver.quota_error()
+
+    def open_by_key(self, sheet_id: str) -> FakeSpreadsheet:
+        self.simulate_call('open_by_key')
+        if sheet_id not in self.spreadsheets:
+            raise SpreadsheetNotFound(sheet_id)
+        return self.spreadsheets[sheet_id]
+
+    def dump(self) -> dict[str, dict[str, list]]:
+        with self.lock:
+            return {
+                sheet_id: {
+                    title: [list(row) for row in worksheet.rows]
+                    for title, worksheet in spreadsheet.worksheets.items()
+                }
+                for sheet_id, spreadsheet in self.spreadsheets.items()
+            }
+
+    def persist(self):
+        if not self.should_persist:
+            return
+        data = self.dump()
+        with self.lock:
+            Path(self.source).write_text(
+                json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8'
+            )
@@ -0,0 +1,241 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+from gspread.exceptions import APIError
+
+from algobot.utils.metrics import Histogram
+from .base import BaseSheetsDriver
+
+T = TypeVar('T')
+READ, WRITE = 'read', 'write'
+WRITE_METHODS = {
+    'update_cells',
+    'batch_update',
+    'update',
+    'update_cell',
+    'update_acell',
+    'append_row',
+    'append_rows',
+    'clear',
+    'batch_clear',
+    'values_batch_update',
+}
+# drive metadata has a quota of its own and is not counted against sheets requests
+UNLIMITED_METHODS = {'get_lastUpdateTime'}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+sheets_call_seconds = Histogram(
+    'algobot_sheets_call_seconds',
+    'Sheets API calls by worksheet and method, quota waits and retries included',
+    ('worksheet', 'method', 'outcome'),
+)
+
+
+class QuotaExhaustedError(Exception):
+    def __init__(self, kind: str, reason: str):
+        self.kind = kind
+        self.reason = reason
+        super().__init__(f'Sheets {kind} quota is exhausted: {reason}')
+
+
+@dataclass
+class SchedulerStatistics:
+    reads: int = 0
+    writes: int = 0
+    retries: int = 0
+    throttled: int = 0
+    failures: int = 0
+    rejected: int = 0
+    read_wait: float = 0
+    write_wait: float = 0
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class QuotaScheduler:
+    def __init__(
+        self,
+        reads_per_minute: float = 60,
+        writes_per_minute: float = 60,
+        max_retries: int = 5,
+        backoff: float = 1,
+        max_backoff: float = 32,
+        max_wait: float = 30,
+        max_queue: int = 256,
+    ):
+        # callers are turned away rather than queued for the whole length of an outage
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statistics = SchedulerStatistics()
+        self.waiting = Counter()
+        self._condition = threading.Condition()
+        self._buckets = {
+            READ: _TokenBucket(reads_per_minute),
+            WRITE: _TokenBucket(writes_per_minute),
+        }
+        self._paused_until = 0.0
+
+    def _acquire(self, kind: str, backoff: float | None = None):
+        started = time.monotonic()
+        # a retry was admitted already, the backoff it sits out is not held against it
+        deadline = started + self.max_wait + (backoff or 0)
+        with self._condition:
+            if backoff is None and self.waiting[kind] >= self.max_queue:
+                self.statistics.rejected += 1
+                raise QuotaExhaustedError(
+                    kind, f'{self.waiting[kind]} calls already waiting'
+                )
+            self.waiting[kind] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    bucket = self._buckets[kind]
+                    bucket.refill(now)
+                    delay = max(self._paused_until - now, bucket.delay())
+                    # reads step aside while commits are queued, they are woken up after them
+                    if delay <= 0 and not (kind == READ and self.waiting[WRITE] > 0):
+                        bucket.tokens -= 1
+                        break
+                    # a token that comes after the deadline is not waited for at all
+                    if now + max(delay, 0) > deadline:
+                        self.statistics.rejected += 1
+                        raise QuotaExhaustedError(
+                            kind, f'not available within {self.max_wait}s'
+                        )
+                    self._condition.wait(delay if delay > 0 else deadline - now)
+            finally:
+                self.waiting[kind] -= 1
+                self._condition.notify_all()
+
+            waited = time.monotonic() - started
+            if kind == WRITE:
+                self.statistics.writes += 1
+                self.statistics.write_wait += waited
+            else:
+                self.statistics.reads += 1
+                self.statistics.read_wait += waited
+
+    def _backoff_delay(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def call(self, kind: str | None, func: Callable[..., T], *args, **kwargs) -> T:
+        attempt, backoff = 0, None
+        while True:
+            if kind is not None:
+                self._acquire(kind, backoff)
+            try:
+                return func(*args, **kwargs)
+            except APIError as e:
+                status = e.response.status_code
+                if status not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    with self._condition:
+                        self.statistics.failures += 1
+                    raise
+                backoff = self._backoff_delay(attempt)
+                logging.warning(
+                    f'Sheets call {getattr(func, "__name__", func)} failed with {status}, '
+                    f'retrying in {backoff:.1f}s'
+                )
+                with self._condition:
+                    self.statistics.retries += 1
+                    if status == 429:
+                        # the quota is shared, so every caller backs off, not just this one
+                        self.statistics.throttled += 1
+                        self._paused_until = max(
+                            self._paused_until, time.monotonic() + backoff
+                        )
+                if status != 429 or kind is None:
+                    time.sleep(backoff)
+                attempt += 1
+
+
+def _scheduled_call(
+    scheduler: QuotaScheduler | None,
+    worksheet: str,
+    name: str,
+    func: Callable[..., T],
+    *args,
+    **kwargs,
+) -> T:
+    kind = (
+        None if name in UNLIMITED_METHODS else WRITE if name in WRITE_METHODS else READ
+    )
+    started, outcome = time.perf_counter(), 'ok'
+    try:
+        if scheduler is None:
+            return func(*args, **kwargs)
+        return scheduler.call(kind, func, *args, **kwargs)
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        sheets_call_seconds.observe(
+            time.perf_counter() - started,
+            worksheet=worksheet,
+            method=name,
+            outcome=outcome,
+        )
+
+
+class _ScheduledProxy:
+    def __init__(
+        self, target: Any, scheduler: QuotaScheduler | None, worksheet: str = ''
+    ):
+        self._target = target
+        self._scheduler = scheduler
+        self._worksheet = worksheet
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+        return lambda *args, **kwargs: _scheduled_call(
+            self._scheduler, self._worksheet, name, attribute, *args, **kwargs
+        )
+
+
+class _ScheduledSpreadsheet(_ScheduledProxy):
+    def worksheet(self, title: str) -> _ScheduledProxy:
+        worksheet = _scheduled_call(
+            self._scheduler, title, 'worksheet', self._target.worksheet, title
+        )
+        return _ScheduledProxy(worksheet, self._scheduler, title)
+
+
+class ScheduledSheetsDriver(BaseSheetsDriver):
+    def __init__(
+        self, driver: BaseSheetsDriver, scheduler: QuotaScheduler | None = None
+    ):
+        self.driver = driver
+        self.scheduler = scheduler
+
+    def __getattr__(self, name: str):
+        return getattr(self.driver, name)
+
+    def open_by_key(self, sheet_id: str) -> _ScheduledSpreadsheet:
+        spreadsheet = _scheduled_call(
+            self.scheduler, '', 'open_by_key', self.driver.open_by_key, sheet_id
+        )
+        return _ScheduledSpreadsheet(spreadsheet, self.scheduler)
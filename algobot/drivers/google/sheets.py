@@ -1,7 +1,9 @@
 from gspread import service_account, Spreadsheet
 
+from .base import BaseSheetsDriver
 
-class SheetsDriver:
+
+class SheetsDriver(BaseSheetsDriver):
     def __init__(self, credentials_file: str):
         self.service = service_account(filename=credentials_file)
 
@@ -1,13 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Type, TypeVar
+
 from peewee import SqliteDatabase
 
 from algobot.config import local_config
+from algobot.utils.metrics import Histogram
+
+T = TypeVar('T')
+# the connector method on whose behalf statements are executed in the current context
+query_source: ContextVar[str] = ContextVar('query_source', default='other')
+sqlite_query_seconds = Histogram(
+    'algobot_sqlite_query_seconds',
+    'SQLite statements by connector method',
+    ('source',),
+)
+
+
+class CountingSqliteDatabase(SqliteDatabase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = 0
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        self.queries += 1
+        started = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, *args, **kwargs)
+        finally:
+            sqlite_query_seconds.observe(
+                time.perf_counter() - started, source=query_source.get()
+            )
+
+
+def _with_query_source(source: str, func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = query_source.set(source)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            query_source.reset(token)
+
+    return wrapper
 
-database = SqliteDatabase(
+
+def instrument_queries(cls: Type[T]) -> Type[T]:
+    for name, member in list(vars(cls).items()):
+        if isinstance(member, staticmethod):
+            source = f'{cls.__name__}.{name}'
+            setattr(
+                cls, name, staticmethod(_with_query_source(source, member.__func__))
+            )
+    return cls
+
+
+database = CountingSqliteDatabase(
     local_config['sqlite_source'],
     pragmas={
         'journal_mode': 'wal',
         'foreign_keys': 1,
         'ignore_check_constrains': 0,
+        # statements from other threads wait for the writer instead of failing as locked
+        'busy_timeout': local_config.get('sqlite_busy_timeout', 5000),
     },
 )
 database.connect()
+
+# peewee keeps a connection per thread, so in wal mode every reader gets its own
+# while all writes, and their fsyncs, are serialized on a single thread
+sqlite_read_executor = ThreadPoolExecutor(
+    max_workers=local_config.get('sqlite_readers', 4),
+    thread_name_prefix='sqlite-read',
+)
+sqlite_write_executor = ThreadPoolExecutor(
+    max_workers=1,
+    thread_name_prefix='sqlite-write',
+)
+
+
+def run_write(func: Callable[..., T], *args, **kwargs) -> T:
+    return sqlite_write_executor.submit(func, *args, **kwargs).result()
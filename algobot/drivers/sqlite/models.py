@@ -1,4 +1,13 @@
-from peewee import Model, AutoField, CharField, ForeignKeyField, IntegerField
+from peewee import (
+    Model,
+    AutoField,
+    BlobField,
+    CharField,
+    CompositeKey,
+    DoubleField,
+    ForeignKeyField,
+    IntegerField,
+)
 
 from algobot.drivers.sqlite import database
 
@@ -45,4 +54,28 @@ class Transfer(Model):
         database = database
 
 
-database.create_tables([Student, Course, User, Transfer], safe=True)
+class Snapshot(Model):
+    sheet_id = CharField()
+    worksheet = CharField()
+    values = BlobField()
+    update_time = CharField(null=True)
+    fetched_at = DoubleField()
+
+    class Meta:
+        database = database
+        table_name = 'snapshot'
+        primary_key = CompositeKey('sheet_id', 'worksheet')
+
+
+class Session(Model):
+    key = CharField(primary_key=True)
+    state = CharField(null=True)
+    data = BlobField()
+    updated_at = DoubleField(index=True)
+
+    class Meta:
+        database = database
+        table_name = 'fsm_session'
+
+
+database.create_tables([Student, Course, User, Transfer, Snapshot, Session], safe=True)
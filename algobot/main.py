@@ -1,21 +1,74 @@
 from .logsetup import root_logger
 
 import asyncio
+import signal
 
-import json5
 from aiogram import Bot
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 
-from algobot.bot import dispatcher
+from algobot.bot import dispatcher, update_limiter
+from algobot.bot.metrics import start_metrics_server
+from algobot.config import local_config, telegram_config
+
+
+async def run_webhook(bot: Bot):
+    webhook_config = telegram_config['webhook']
+    path = webhook_config.get('path', '/webhook')
+    secret_token = webhook_config.get('secret_token')
+
+    app = web.Application()
+    SimpleRequestHandler(dispatcher, bot, secret_token=secret_token).register(
+        app, path=path
+    )
+    setup_application(app, dispatcher, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(
+        runner, webhook_config.get('host', '0.0.0.0'), webhook_config.get('port', 8080)
+    )
+    await site.start()
+    await bot.set_webhook(
+        webhook_config['url'],
+        secret_token=secret_token,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+    )
+    root_logger.info(f'Listening for updates on {site.name}{path}')
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(stop_signal, stopped.set)
+    try:
+        await stopped.wait()
+    finally:
+        root_logger.info('Shutting down...')
+        # stop accepting updates, let the accepted ones finish, then run shutdown hooks
+        await site.stop()
+        await update_limiter.drain()
+        await runner.cleanup()
 
 
 async def main():
-    with open('config/config.json5') as config_stream:
-        config = json5.load(config_stream)
-    token = config['telegram']['token']
+    token = telegram_config['token']
 
     bot = Bot(token)
     root_logger.info('Starting up...')
-    await dispatcher.start_polling(bot)
+    metrics_runner = None
+    if metrics_config := local_config.get('metrics'):
+        metrics_runner = await start_metrics_server(
+            metrics_config.get('host', '127.0.0.1'), metrics_config.get('port', 9100)
+        )
+        root_logger.info(f'Serving metrics on port {metrics_config.get("port", 9100)}')
+    try:
+        if telegram_config.get('mode', 'polling') == 'webhook':
+            await run_webhook(bot)
+        else:
+            await dispatcher.start_polling(bot)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
 if __name__ == '__main__':
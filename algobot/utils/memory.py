@@ -0,0 +1,32 @@
+import sys
+from array import array
+from types import FunctionType, MethodType, ModuleType
+
+# shared or foreign objects, counting them once per owner would only inflate the estimate
+_OPAQUE = (type, ModuleType, FunctionType, MethodType)
+
+
+def deep_sizeof(obj, seen: set[int] | None = None) -> int:
+    if seen is None:
+        seen = set()
+    total, stack = 0, [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _OPAQUE):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, bytearray, array, int, float)):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        else:
+            if hasattr(item, '__dict__'):
+                stack.append(vars(item))
+            for name in getattr(type(item), '__slots__', ()):
+                if hasattr(item, name):
+                    stack.append(getattr(item, name))
+    return total
@@ -0,0 +1,147 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+Sample = tuple[str, dict[str, str], float]
+
+
+class Metric:
+    type_name = 'untyped'
+    registry: list['Metric'] = []
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        Metric.registry.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def _labels(self, key: tuple[str, ...]) -> dict[str, str]:
+        return dict(zip(self.label_names, key))
+
+    def samples(self) -> Iterable[Sample]:
+        return []
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        return [(self.name, self._labels(key), value) for key, value in values]
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: counts per bucket (cumulated on render), sum and count
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[0][i] += 1
+                    break
+            counts[1] += value
+            counts[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = [
+                (key, list(buckets), total, count)
+                for key, (buckets, total, count) in self._values.items()
+            ]
+        samples = []
+        for key, buckets, total, count in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, buckets):
+                cumulative += bucket
+                samples.append(
+                    (
+                        f'{self.name}_bucket',
+                        {**labels, 'le': repr(float(bound))},
+                        cumulative,
+                    )
+                )
+            samples.append((f'{self.name}_bucket', {**labels, 'le': '+Inf'}, count))
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, count))
+        return samples
+
+
+class CallbackMetric(Metric):
+    # values owned by other objects (cache statistics, queue sizes) are read at render time
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        type_name: str,
+        collect: Callable[[], dict[tuple[str, ...], float]],
+        label_names: Iterable[str] = (),
+    ):
+        super().__init__(name, documentation, label_names)
+        self.type_name = type_name
+        self.collect = collect
+
+    def samples(self) -> Iterable[Sample]:
+        return [
+            (self.name, self._labels(key), value)
+            for key, value in self.collect().items()
+        ]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render() -> str:
+    lines = []
+    for metric in Metric.registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type_name}')
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ','.join(
+                    f'{label}="{_escape(text)}"' for label, text in labels.items()
+                )
+                name = f'{name}{{{label_text}}}'
+            lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
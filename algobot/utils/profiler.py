@@ -0,0 +1,108 @@
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
+
+@dataclass
+class ProfileReport:
+    summary: str
+    dump: bytes
+    filename: str
+
+
+class CallProfiler:
+    # cProfile only traces the thread it was enabled in, here the event loop
+    def __init__(self, top: int = 20):
+        self.top = top
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self) -> ProfileReport:
+        self.profile.disable()
+        output = io.StringIO()
+        pstats.Stats(self.profile, stream=output).sort_stats('cumulative').print_stats(
+            self.top
+        )
+        self.profile.create_stats()
+        dump = marshal.dumps(self.profile.stats) if self.profile.stats else b''
+        return ProfileReport(output.getvalue(), dump, 'profile.prof')
+
+
+class StackSampler:
+    # samples the stacks of every thread, so sheets and sqlite workers are seen too
+    def __init__(self, interval: float = 0.005, top: int = 20):
+        self.interval = interval
+        self.top = top
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='stack-sampler', daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+                    )
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {
+                        thread.ident: thread.name for thread in threading.enumerate()
+                    }
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> ProfileReport:
+        self._stopped.set()
+        self._thread.join()
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack[1:]):
+                total[function] += count
+
+        lines = [
+            f'{self.samples} samples every {self.interval * 1000:.0f}ms',
+            '',
+            'own:',
+        ]
+        lines += [
+            f'{count:>7} {function}' for function, count in own.most_common(self.top)
+        ]
+        lines += ['', 'total:']
+        lines += [
+            f'{count:>7} {function}' for function, count in total.most_common(self.top)
+        ]
+        # collapsed stacks, the input format of flamegraph tools
+        dump = '\n'.join(
+            f'{";".join(stack)} {count}' for stack, count in self.stacks.items()
+        )
+        return ProfileReport('\n'.join(lines), dump.encode(), 'stacks.txt')
+
+
+def create_profiler(mode: str) -> CallProfiler | StackSampler:
+    if mode == 'calls':
+        return CallProfiler()
+    if mode == 'stacks':
+        return StackSampler()
+    raise ValueError(f'Unknown profiling mode `{mode}`, expected `calls` or `stacks`')
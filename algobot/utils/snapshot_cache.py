@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+V = TypeVar('V')
+
+
+@dataclass
+class CacheStatistics:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    refreshes: int = 0
+    errors: int = 0
+
+
+@dataclass
+class _Entry(Generic[V]):
+    value: V
+    fetched_at: float
+
+
+class SnapshotCache(Generic[V]):
+    def __init__(
+        self,
+        ttl: float,
+        stale_ttl: float = 0,
+        refresh_executor: Executor | None = None,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl if refresh_executor else 0
+        self.refresh_executor = refresh_executor
+        self.statistics = CacheStatistics()
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, _Entry[V]] = {}
+        self._in_flight: dict[Hashable, Future] = {}
+        # loads started before an invalidation may return data older than it
+        self._generation = 0
+
+    def get(
+        self, key: Hashable, loader: Callable[[], V], allow_stale: bool = True
+    ) -> V:
+        owner = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                age = time.monotonic() - entry.fetched_at
+                if age < self.ttl:
+                    self.statistics.hits += 1
+                    return entry.value
+                if allow_stale and age < self.ttl + self.stale_ttl:
+                    self.statistics.stale_hits += 1
+                    if key not in self._in_flight:
+                        future = self._in_flight[key] = Future()
+                        self.refresh_executor.submit(
+                            self._load, key, loader, future, self._generation
+                        )
+                    return entry.value
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.statistics.coalesced += 1
+            else:
+                self.statistics.misses += 1
+                future = self._in_flight[key] = Future()
+                generation = self._generation
+                owner = True
+        if owner:
+            self._load(key, loader, future, generation)
+        return future.result()
+
+    def _load(
+        self, key: Hashable, loader: Callable[[], V], future: Future, generation: int
+    ):
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self.statistics.errors += 1
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+            logging.warning(f'Failed to refresh snapshot {key}: {e!r}')
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self.statistics.refreshes += 1
+            # waiters still get the value, it is just not kept past an invalidation
+            if generation == self._generation:
+                self._entries[key] = _Entry(value, time.monotonic())
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        future.set_result(value)
+
+    def peek(self, key: Hashable) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry else None
+
+    def values(self) -> list[V]:
+        with self._lock:
+            return [entry.value for entry in self._entries.values()]
+
+    def put(self, key: Hashable, value: V, expired: bool = False):
+        # an expired value is only served where stale values are allowed
+        fetched_at = time.monotonic() - (self.ttl if expired else 0)
+        with self._lock:
+            self._entries[key] = _Entry(value, fetched_at)
+
+    def update(self, key: Hashable, update: Callable[[V], V]):
+        # the entry keeps its age, only the value is replaced
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries[key] = _Entry(update(entry.value), entry.fetched_at)
+
+    def invalidate(self, key: Hashable | None = None):
+        with self._lock:
+            self._generation += 1
+            # later readers start a load of their own instead of joining an outdated one
+            if key is None:
+                self._in_flight.clear()
+                self._entries.clear()
+            else:
+                self._in_flight.pop(key, None)
+                self._entries.pop(key, None)
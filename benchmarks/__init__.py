@@ -0,0 +1,27 @@
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+
+def use_throwaway_config():
+    # algobot reads its config and opens the database on import, micro-benchmarks only
+    # need the table classes and never touch the configured bot, sheets or database
+    if 'algobot.config' in sys.modules:
+        return
+    directory = Path(tempfile.mkdtemp(prefix='algobot-benchmark-'))
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    config = {
+        'local': {'sqlite_source': str(directory / 'users.db'), 'debug_mode': False},
+        'telegram': {'token': '42:benchmark', 'admin_id': 1, 'teacher_ids': []},
+        'sheets': {
+            'credentials_file': str(directory / 'missing-credentials.json'),
+            'driver': 'fake',
+            'courses': [],
+        },
+    }
+    (directory / 'config.json5').write_text(json.dumps(config), encoding='utf-8')
+    os.environ['ALGOBOT_CONFIG'] = str(directory / 'config.json5')
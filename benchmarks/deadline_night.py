@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+from typing import AsyncGenerator
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.types import (
+    CallbackQuery,
+    Chat,
+    InlineKeyboardMarkup,
+    Message,
+    Update,
+    User,
+)
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SHEET_ID = 'deadline-night'
+COURSE = 'algo'
+TEMPLATE = 'default-6'
+BOT_USER = User(id=42, is_bot=True, first_name='algobot')
+
+
+def make_sheet(students: int, weeks: int, tasks: int, fill: float) -> list[list[str]]:
+    # default-6 layout: 6 index columns, week and task header rows, a total column per week
+    header_weeks, header_tasks = [''] * 6, ['ФИО', '#', '', '', '', '']
+    for week in range(1, weeks + 1):
+        header_weeks += [f'Week {week}'] + [''] * tasks
+        header_tasks += [f'{week}.{task}' for task in range(1, tasks + 1)] + ['Total']
+
+    markers = ['+', '+', '+', '~', '-', 'x', 'y', '!']
+    rows = [header_weeks, header_tasks]
+    for student in range(students):
+        row = [f'Student {student}', str(student + 1), '', '', '', '']
+        for week in range(weeks):
+            row += [
+                random.choice(markers) if random.random() < fill else ''
+                for _ in range(tasks)
+            ] + ['']
+        rows.append(row)
+    return rows
+
+
+def prepare_environment(
+    directory: Path, args: argparse.Namespace
+) -> list[tuple[str, str]]:
+    groups = [f'B{group:04}' for group in range(args.groups)]
+    per_group = args.students // args.groups
+    sheets = {
+        group: make_sheet(per_group, args.weeks, args.tasks, args.fill)
+        for group in groups
+    }
+    (directory / 'sheets.json').write_text(
+        json.dumps({SHEET_ID: sheets}), encoding='utf-8'
+    )
+
+    config = {
+        'local': {'sqlite_source': str(directory / 'users.db'), 'debug_mode': False},
+        'telegram': {'token': '42:benchmark', 'admin_id': 1, 'teacher_ids': []},
+        'sheets': {
+            'credentials_file': str(directory / 'missing-credentials.json'),
+            'driver': 'fake',
+            'fake': {
+                'source': str(directory / 'sheets.json'),
+                'latency': args.latency,
+                'jitter': args.jitter,
+                'error_rate': args.error_rate,
+            },
+            'courses': [
+                {
+                    'course': COURSE,
+                    'groups': groups,
+                    'sheet_id': SHEET_ID,
+                    'template': TEMPLATE,
+                }
+            ],
+        },
+    }
+    (directory / 'config.json5').write_text(json.dumps(config), encoding='utf-8')
+    os.environ['ALGOBOT_CONFIG'] = str(directory / 'config.json5')
+    return [
+        (group, f'Student {student}')
+        for group in groups
+        for student in range(per_group)
+    ]
+
+
+class FakeSession(BaseSession):
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+        self.message_ids = count(1)
+        self.last_messages: dict[int, Message] = {}
+
+    async def make_request(self, bot: Bot, method, timeout: int | None = None):
+        self.calls[type(method).__name__] += 1
+        if not isinstance(method, (SendMessage, EditMessageText)):
+            return True
+
+        chat_id = int(method.chat_id)
+        markup = (
+            method.reply_markup
+            if isinstance(method.reply_markup, InlineKeyboardMarkup)
+            else None
+        )
+        message_id = getattr(method, 'message_id', None) or next(self.message_ids)
+        message = Message(
+            message_id=message_id,
+            date=datetime.now(),
+            chat=Chat(id=chat_id, type='private'),
+            from_user=BOT_USER,
+            text=method.text,
+            reply_markup=markup,
+        ).as_(bot)
+        self.last_messages[chat_id] = message
+        return message
+
+    async def stream_content(
+        self, url: str, *args, **kwargs
+    ) -> AsyncGenerator[bytes, None]:
+        # the scenario never downloads files, any file is served as empty
+        self.calls['stream_content'] += 1
+        yield b''
+
+    async def close(self):
+        pass
+
+
+class Harness:
+    def __init__(self, args: argparse.Namespace):
+        from algobot.bot import dispatcher
+        from algobot.drivers.google import sheets_driver
+        from algobot.drivers.sqlite import database
+
+        self.args = args
+        self.dispatcher = dispatcher
+        self.sheets_driver = sheets_driver
+        self.database = database
+        self.session = FakeSession()
+        self.bot = Bot('42:benchmark', session=self.session)
+        self.update_ids = count(1)
+        self.message_ids = count(1)
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors = Counter()
+        # students whose scenario stopped early, by the exception that stopped it
+        self.aborted = Counter()
+
+    async def feed(self, step: str, update: Update):
+        started = time.perf_counter()
+        try:
+            await self.dispatcher.feed_update(self.bot, update)
+        except Exception as e:
+            self.errors[f'{step}: {type(e).__name__}'] += 1
+            raise
+        finally:
+            self.latencies[step].append(time.perf_counter() - started)
+
+    async def send(self, step: str, user: User, text: str):
+        message = Message(
+            message_id=next(self.message_ids),
+            date=datetime.now(),
+            chat=Chat(id=user.id, type='private'),
+            from_user=user,
+            text=text,
+        ).as_(self.bot)
+        await self.feed(step, Update(update_id=next(self.update_ids), message=message))
+
+    def buttons(self, user: User, prefix: str) -> list[str]:
+        message = self.session.last_messages.get(user.id)
+        if not message or not message.reply_markup:
+            return []
+        return [
+            button.callback_data
+            for row in message.reply_markup.inline_keyboard
+            for button in row
+            if button.callback_data and button.callback_data.startswith(prefix)
+        ]
+
+    async def click(self, step: str, user: User, data: str):
+        query = CallbackQuery(
+            id=str(next(self.update_ids)),
+            from_user=user,
+            chat_instance=str(user.id),
+            message=self.session.last_messages[user.id],
+            data=data,
+        ).as_(self.bot)
+        await self.feed(
+            step, Update(update_id=next(self.update_ids), callback_query=query)
+        )
+
+    async def think(self):
+        await asyncio.sleep(random.uniform(0, self.args.think))
+
+    async def simulate_student(self, number: int, group: str, student_name: str):
+        user = User(
+            id=10_000 + number,
+            is_bot=False,
+            first_name='Student',
+            last_name=str(number),
+            username=f'student{number}',
+        )
+        try:
+            await self.send('register', user, '/register')
+            await self.click('register group', user, f'group:{group}')
+            await self.send('register name', user, student_name)
+            for _ in range(self.args.rounds):
+                await self.think()
+                await self.send('tasks', user, '/tasks')
+                weeks = self.buttons(user, 'tasks-week:')
+                await self.think()
+                await self.click('week select', user, random.choice(weeks[-3:]))
+                tasks = self.buttons(user, 'tasks-tasks:')
+                for task in random.sample(tasks, min(len(tasks), self.args.toggles)):
+                    await self.think()
+                    await self.click('task toggle', user, task)
+                await self.think()
+                await self.click('commit', user, 'tasks-commit')
+        except Exception as e:
+            self.aborted[f'{type(e).__name__}: {e}'] += 1
+
+    def counters(self) -> tuple[int, int, int]:
+        return (
+            sum(self.sheets_driver.calls.values()),
+            self.database.queries,
+            sum(self.session.calls.values()),
+        )
+
+    async def run(self, students: list[tuple[str, str]]) -> dict:
+        sheets_before, queries_before, api_before = self.counters()
+        started = time.perf_counter()
+        await asyncio.gather(
+            *[
+                self.simulate_student(number, group, student_name)
+                for number, (group, student_name) in enumerate(students)
+            ]
+        )
+        await self.dispatcher.emit_shutdown(bot=self.bot)
+        elapsed = time.perf_counter() - started
+        sheets_after, queries_after, api_after = self.counters()
+
+        updates = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            'students': len(students),
+            'updates': updates,
+            'seconds': elapsed,
+            'throughput': updates / elapsed,
+            'errors': dict(self.errors),
+            'aborted': dict(self.aborted),
+            'steps': {
+                step: summarize(latencies) for step, latencies in self.latencies.items()
+            },
+            'all': summarize(
+                [value for values in self.latencies.values() for value in values]
+            ),
+            'sheets_calls_per_update': (sheets_after - sheets_before) / max(updates, 1),
+            'sqlite_queries_per_update': (queries_after - queries_before)
+            / max(updates, 1),
+            'telegram_calls_per_update': (api_after - api_before) / max(updates, 1),
+        }
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(latencies: list[float]) -> dict:
+    return {
+        'count': len(latencies),
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def report(results: dict):
+    print(
+        f'{results["students"]} students, {results["updates"]} updates in '
+        f'{results["seconds"]:.1f} s ({results["throughput"]:.1f} updates/s)'
+    )
+    print(f'{"step":<16}{"count":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+    for step, summary in [*results['steps'].items(), ('all', results['all'])]:
+        print(
+            f'{step:<16}{summary["count"]:>8}{summary["p50"]:>10.1f}'
+            f'{summary["p95"]:>10.1f}{summary["p99"]:>10.1f}'
+        )
+    print(f'sheets calls per update:   {results["sheets_calls_per_update"]:.3f}')
+    print(f'sqlite queries per update: {results["sqlite_queries_per_update"]:.3f}')
+    print(f'telegram calls per update: {results["telegram_calls_per_update"]:.3f}')
+    for error, errors in results['errors'].items():
+        print(f'error {error}: {errors}')
+    if results['aborted']:
+        print(
+            f'aborted students: {sum(results["aborted"].values())} of {results["students"]}'
+        )
+    for reason, students in results['aborted'].items():
+        print(f'aborted by {reason}: {students}')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Simulate deadline-night traffic')
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--groups', type=int, default=4)
+    parser.add_argument('--weeks', type=int, default=14)
+    parser.add_argument('--tasks', type=int, default=12)
+    parser.add_argument(
+        '--fill', type=float, default=0.4, help='share of non-empty cells'
+    )
+    parser.add_argument('--rounds', type=int, default=2, help='commits per student')
+    parser.add_argument(
+        '--toggles', type=int, default=3, help='task toggles per commit'
+    )
+    parser.add_argument(
+        '--think', type=float, default=0.5, help='max seconds between actions'
+    )
+    parser.add_argument(
+        '--latency', type=float, default=0.15, help='sheets call latency'
+    )
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, help='write results as json')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    # templates are resolved relative to the project root
+    os.chdir(PROJECT_ROOT)
+
+    with tempfile.TemporaryDirectory() as directory:
+        students = prepare_environment(Path(directory), args)
+
+        from algobot.data.connectors.tables import populate_registry
+
+        populate_registry()
+
+        harness = Harness(args)
+        results = asyncio.run(harness.run(students))
+        report(results)
+        if args.output:
+            args.output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
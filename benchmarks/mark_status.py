@@ -0,0 +1,80 @@
+import random
+import timeit
+
+from . import use_throwaway_config
+
+use_throwaway_config()
+
+from algobot.data.connectors.tables import MarkStatus, Table, TableData
+
+ROWS, COLUMNS = 300, 200
+
+
+# noinspection PyUnresolvedReferences
+def legacy_mark_status(table: Table, column_data: list, row: int) -> MarkStatus:
+    marker = column_data[row]
+    if marker != table.markers.NONE.value:
+        if marker in (
+            table.markers.CHOSEN.value,
+            table.markers.FULL.value,
+            table.markers.HALF.value,
+            table.markers.FAIL.value,
+        ):
+            return MarkStatus.MARKED_LOCKED
+        return MarkStatus.MARKED
+    if any(
+        value
+        in (
+            table.markers.CHOSEN.value,
+            table.markers.FULL.value,
+            table.markers.HALF.value,
+        )
+        for value in column_data
+    ):
+        return MarkStatus.EMPTY_LOCKED
+    return MarkStatus.EMPTY
+
+
+def make_columns() -> list[list[str]]:
+    random.seed(0)
+    markers = [''] * 12 + ['+'] * 4 + ['~', '-', 'x', 'y', '!']
+    return [
+        # most columns are not locked, which is the worst case for the scan
+        (
+            [random.choice(markers[:16]) for _ in range(ROWS)]
+            if column % 4
+            else [random.choice(markers) for _ in range(ROWS)]
+        )
+        for column in range(COLUMNS)
+    ]
+
+
+def main():
+    table = Table.__new__(Table)
+    table.template = {}
+    table.markers = table._create_markers()
+    table._cache_marker_values()
+    columns = make_columns()
+
+    def legacy():
+        for column_data in columns:
+            for row in range(ROWS):
+                legacy_mark_status(table, column_data, row)
+
+    def summarized():
+        table_data = TableData(columns, ROWS, table.lock_markers)
+        for column in range(COLUMNS):
+            for row in range(ROWS):
+                table._mark_status(table_data, column, row)
+
+    repeat = 3
+    legacy_time = min(timeit.repeat(legacy, number=1, repeat=repeat))
+    summarized_time = min(timeit.repeat(summarized, number=1, repeat=repeat))
+    print(f'{ROWS} rows x {COLUMNS} columns, every cell status')
+    print(f'column scan:    {legacy_time * 1000:.1f} ms')
+    print(f'column summary: {summarized_time * 1000:.1f} ms')
+    print(f'speedup:        {legacy_time / summarized_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import timeit
+import tracemalloc
+
+from . import use_throwaway_config
+
+use_throwaway_config()
+
+from algobot.data.connectors.tables import Table, TableData
+from .mark_status import COLUMNS, ROWS, make_columns
+
+WEEK_TASKS = 12
+
+
+def allocated(factory) -> int:
+    tracemalloc.start()
+    value = factory()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def main():
+    table = Table.__new__(Table)
+    table.template = {}
+    table.markers = table._create_markers()
+    table._cache_marker_values()
+
+    raw_size = allocated(make_columns)
+    columns = make_columns()
+    table_data = TableData(columns, ROWS, table.lock_markers)
+    columnar_size = allocated(lambda: TableData(columns, ROWS, table.lock_markers))
+
+    weeks = [
+        range(start, start + WEEK_TASKS)
+        for start in range(0, COLUMNS - WEEK_TASKS, WEEK_TASKS)
+    ]
+
+    def week_queries():
+        for row in range(ROWS):
+            for week in weeks:
+                [
+                    table._marker_status(marker, locked)
+                    for marker, locked in zip(
+                        table_data.row_markers(row, week),
+                        table_data.locked_columns(week),
+                    )
+                ]
+
+    query_time = min(timeit.repeat(week_queries, number=1, repeat=5))
+    queries = ROWS * len(weeks)
+    print(f'{ROWS} rows x {COLUMNS} columns')
+    print(f'nested lists:      {raw_size / 1024:.0f} KiB')
+    print(f'columnar store:    {columnar_size / 1024:.0f} KiB')
+    print(f'week status query: {query_time / queries * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()